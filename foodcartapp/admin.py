@@ -3,7 +3,7 @@ from django.shortcuts import reverse, redirect
 from django.templatetags.static import static
 from django.utils.html import format_html
 
-from .models import Product, Order, ProductSet
+from .models import ArchivedOrder, ArchivedProductSet, Banner, Product, Order, ProductSet
 from .models import ProductCategory
 from .models import Restaurant
 from .models import RestaurantMenuItem
@@ -120,9 +120,10 @@ class ProductInline(admin.TabularInline):
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ['firstname', 'lastname', 'phonenumber', 'address', 'payment_method']
+    list_display = ['firstname', 'lastname', 'phonenumber', 'address', 'payment_method', 'total_price']
     inlines = [ProductInline, ]
     exclude = ('products', )
+    readonly_fields = ['total_price']
 
     def response_change(self, request, obj):
         default_response = super().response_post_save_change(request, obj)
@@ -130,3 +131,50 @@ class OrderAdmin(admin.ModelAdmin):
             return redirect('/manager/orders/')
         else:
             return default_response
+
+
+class ArchivedProductInline(admin.TabularInline):
+    model = ArchivedProductSet
+    extra = 0
+    can_delete = False
+    readonly_fields = ['product', 'quantity', 'price']
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ['id', 'firstname', 'lastname', 'phonenumber', 'address', 'created_at', 'total_price']
+    list_filter = ['payment_method', 'performer']
+    search_fields = ['id', 'lastname', 'phonenumber', 'address']
+    date_hierarchy = 'created_at'
+    inlines = [ArchivedProductInline, ]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Banner)
+class BannerAdmin(admin.ModelAdmin):
+    list_display = ['get_image_list_preview', 'title', 'position', 'is_active', 'active_from', 'active_until']
+    list_display_links = ['title']
+    list_editable = ['position', 'is_active']
+    list_filter = ['is_active']
+    readonly_fields = ['get_image_preview']
+    fields = ['title', 'text', 'image', 'get_image_preview', 'position', 'is_active', 'active_from', 'active_until']
+
+    def get_image_preview(self, obj):
+        if not obj.image:
+            return 'выберите картинку'
+        return format_html('<img src="{url}" style="max-height: 200px;"/>', url=obj.image.url)
+    get_image_preview.short_description = 'превью'
+
+    def get_image_list_preview(self, obj):
+        if not obj.image:
+            return 'нет картинки'
+        return format_html('<img src="{src}" style="max-height: 50px;"/>', src=obj.image.url)
+    get_image_list_preview.short_description = 'превью'
@@ -0,0 +1,56 @@
+from django.db import transaction
+
+from .models import ArchivedOrder, ArchivedProductSet, Order, ProductSet
+from .signals import mute_order_signals
+
+ORDER_FIELDS = [
+    'id', 'firstname', 'lastname', 'phonenumber', 'address', 'status', 'comment',
+    'created_at', 'called_at', 'delivered_at', 'payment_method', 'performer_id', 'total_price',
+]
+
+
+def get_archivable_orders(created_before):
+    return Order.objects.filter(status='Completed', created_at__lt=created_before)
+
+
+def archive_orders(order_ids):
+    """Move orders with their product sets to the archive tables in one transaction."""
+    with transaction.atomic(), mute_order_signals():
+        # The status may have changed since the orders were selected
+        orders = Order.objects.filter(pk__in=order_ids, status='Completed').select_for_update()
+        archived_orders = [
+            ArchivedOrder(**{field: getattr(order, field) for field in ORDER_FIELDS})
+            for order in orders
+        ]
+        ArchivedOrder.objects.bulk_create(archived_orders)
+
+        archived_ids = [order.id for order in archived_orders]
+        product_sets = ProductSet.objects.filter(order__in=archived_ids)
+        ArchivedProductSet.objects.bulk_create([
+            ArchivedProductSet(
+                order_id=product_set.order_id,
+                product_id=product_set.product_id,
+                quantity=product_set.quantity,
+                price=product_set.price,
+            )
+            for product_set in product_sets
+        ])
+
+        # Product sets PROTECT their orders, so they go first
+        product_sets.delete()
+        Order.objects.filter(pk__in=archived_ids).delete()
+    return len(archived_orders)
+
+
+def find_order(pk):
+    """Find an order among current ones, then in the archive."""
+    order = Order.objects.filter(pk=pk).first()
+    if order:
+        return order
+    return ArchivedOrder.objects.filter(pk=pk).first()
+
+
+def get_all_orders_values(*fields):
+    """Field values of current and archived orders in one query, for reports."""
+    fields = fields or ORDER_FIELDS
+    return Order.objects.values(*fields).union(ArchivedOrder.objects.values(*fields), all=True)
@@ -0,0 +1,39 @@
+from collections import defaultdict
+
+
+class RestaurantAvailability:
+    """Inverted index of restaurant menus: product id -> ids of restaurants selling it.
+
+    Build it once per request with `load()` and ask `restaurants_for()` as many
+    times as needed: every answer is an intersection of in-memory sets.
+    """
+
+    def __init__(self, menu_items):
+        self.restaurants_by_product = defaultdict(set)
+        self.restaurant_ids = set()
+        for restaurant_id, product_id in menu_items:
+            self.restaurants_by_product[product_id].add(restaurant_id)
+            self.restaurant_ids.add(restaurant_id)
+
+    @classmethod
+    def load(cls):
+        from .models import RestaurantMenuItem
+
+        menu_items = (
+            RestaurantMenuItem.objects
+            .filter(availability=True)
+            .values_list('restaurant_id', 'product_id')
+        )
+        return cls(menu_items)
+
+    def restaurants_for(self, product_ids):
+        """Return ids of restaurants that have every product on sale."""
+        product_ids = set(product_ids)
+        if not product_ids:
+            return set(self.restaurant_ids)
+
+        restaurant_sets = sorted(
+            (self.restaurants_by_product.get(product_id, set()) for product_id in product_ids),
+            key=len,
+        )
+        return restaurant_sets[0].intersection(*restaurant_sets[1:])
@@ -0,0 +1,55 @@
+import hashlib
+
+from django.utils import timezone
+
+from .catalog import bump_version, get_version, get_version_datetime
+from .models import Banner
+from .renderers import wants_pretty_json
+
+BANNERS_VERSION_KEY = 'banners:version'
+
+# Banners of the process, reloaded from the database when the version changes
+loaded_banners = {'version': None, 'banners': []}
+
+
+def bump_banners_version():
+    """Make every process reload banners. Call it whenever a banner changes."""
+    return bump_version(BANNERS_VERSION_KEY)
+
+
+def get_banners():
+    """Return all active banners, from the process memory when they are up to date."""
+    global loaded_banners
+
+    version = get_version(BANNERS_VERSION_KEY)
+    if loaded_banners['version'] != version:
+        loaded_banners = {
+            'version': version,
+            'banners': list(Banner.objects.filter(is_active=True)),
+        }
+    return loaded_banners['banners']
+
+
+def get_shown_banners(now=None):
+    now = now or timezone.now()
+    return [banner for banner in get_banners() if banner.is_shown(now)]
+
+
+def get_banners_etag(request):
+    # Banners appear and disappear by their schedule without a version bump
+    shown_ids = ','.join(str(banner.pk) for banner in get_shown_banners())
+    content = f'{get_version(BANNERS_VERSION_KEY)}:{shown_ids}'
+    # Pretty JSON is a different representation of the same banners
+    encoding = 'pretty' if wants_pretty_json(request) else 'compact'
+    return f'{hashlib.sha1(content.encode()).hexdigest()}-{encoding}'
+
+
+def get_banners_last_modified(request):
+    now = timezone.now()
+    changes = [get_version_datetime(get_version(BANNERS_VERSION_KEY))]
+    for banner in get_banners():
+        changes += [
+            moment for moment in (banner.active_from, banner.active_until)
+            if moment and moment <= now
+        ]
+    return max(changes)
@@ -0,0 +1,97 @@
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+
+from .models import Product
+from .renderers import choose_content_encoding, wants_pretty_json
+
+CATALOG_VERSION_KEY = 'catalog:version'
+CATALOG_PAYLOAD_KEY = 'catalog:precompressed:{version}'
+CATALOG_PRICES_KEY = 'catalog:prices:{version}'
+CATALOG_HITS_KEY = 'catalog:hits'
+CATALOG_MISSES_KEY = 'catalog:misses'
+CATALOG_PAYLOAD_TIMEOUT = 60 * 60 * 24
+
+
+def bump_version(key):
+    """Store a new version under `key`: the current time in microseconds."""
+    version = time.time_ns() // 1000
+    cache.set(key, version, timeout=None)
+    return version
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        version = bump_version(key)
+    return version
+
+
+def get_version_datetime(version):
+    return datetime.fromtimestamp(version / 1_000_000, tz=timezone.utc)
+
+
+def bump_catalog_version():
+    """Invalidate cached catalog payloads. Call it whenever the menu changes."""
+    return bump_version(CATALOG_VERSION_KEY)
+
+
+def get_catalog_version():
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def get_catalog_stats():
+    return {
+        'hits': cache.get(CATALOG_HITS_KEY, 0),
+        'misses': cache.get(CATALOG_MISSES_KEY, 0),
+    }
+
+
+def get_cached_catalog(build_payload):
+    """Return `(payload, is_hit)` for the current catalog version.
+
+    On a miss the payload is built with `build_payload()` and cached until
+    the version is bumped.
+    """
+    payload_key = CATALOG_PAYLOAD_KEY.format(version=get_catalog_version())
+    payload = cache.get(payload_key)
+    if payload is not None:
+        count(CATALOG_HITS_KEY)
+        return payload, True
+
+    count(CATALOG_MISSES_KEY)
+    payload = build_payload()
+    cache.set(payload_key, payload, timeout=CATALOG_PAYLOAD_TIMEOUT)
+    return payload, False
+
+
+def get_available_product_prices():
+    """Return `{product id: price}` of products on sale in some restaurant."""
+    prices_key = CATALOG_PRICES_KEY.format(version=get_catalog_version())
+    prices = cache.get(prices_key)
+    if prices is None:
+        prices = dict(Product.objects.available().values_list('id', 'price'))
+        cache.set(prices_key, prices, timeout=CATALOG_PAYLOAD_TIMEOUT)
+    return prices
+
+
+def get_catalog_etag(request):
+    # Every encoding of the payload is a different representation
+    if wants_pretty_json(request):
+        encoding = 'pretty'
+    else:
+        encoding = choose_content_encoding(request)
+    return f'catalog-{get_catalog_version()}-{encoding}'
+
+
+def get_catalog_last_modified(request):
+    return get_version_datetime(get_catalog_version())
@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from foodcartapp.archive import archive_orders, get_archivable_orders
+
+
+class Command(BaseCommand):
+    help = 'Переносит выполненные заказы старше заданного срока в архивные таблицы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help='Заказы старше скольких дней переносить в архив')
+        parser.add_argument('--batch-size', type=int, default=500, help='Сколько заказов переносить за транзакцию')
+
+    def handle(self, *args, **options):
+        created_before = timezone.now() - timedelta(days=options['days'])
+        order_ids = list(get_archivable_orders(created_before).order_by('pk').values_list('pk', flat=True))
+        batch_size = options['batch_size']
+        archived = 0
+        for start in range(0, len(order_ids), batch_size):
+            archived += archive_orders(order_ids[start:start + batch_size])
+        self.stdout.write(f'Перенесено в архив заказов: {archived}')
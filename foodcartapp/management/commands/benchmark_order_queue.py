@@ -0,0 +1,61 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from foodcartapp.models import Order
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет запрос очереди необработанных заказов по мере роста числа выполненных заказов. '
+        'Все созданные заказы удаляются в конце'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--completed', default='0,10000,100000,1000000',
+                            help='Через запятую: при скольких выполненных заказах делать замер')
+        parser.add_argument('--open', type=int, default=200, help='Сколько необработанных заказов создать')
+        parser.add_argument('--repeat', type=int, default=20, help='Сколько раз повторять запрос на каждом шаге')
+        parser.add_argument('--batch-size', type=int, default=10000, help='По сколько заказов вставлять за раз')
+
+    def handle(self, *args, **options):
+        steps = sorted(int(step) for step in options['completed'].split(','))
+        with transaction.atomic():
+            self.create_orders(options['open'], 'Unprocessed', options['batch_size'])
+            completed = 0
+            for step in steps:
+                self.create_orders(step - completed, 'Completed', options['batch_size'])
+                completed = step
+                self.measure(completed, options['repeat'])
+            self.stdout.write(Order.objects.queue()[:100].explain())
+            transaction.set_rollback(True)
+
+    def create_orders(self, count, status, batch_size):
+        while count > 0:
+            batch = min(count, batch_size)
+            Order.objects.bulk_create(
+                Order(
+                    firstname='Бенчмарк',
+                    lastname='Бенчмарк',
+                    phonenumber='+79001234567',
+                    address='Москва',
+                    status=status,
+                    payment_method='Cash',
+                )
+                for _ in range(batch)
+            )
+            count -= batch
+
+    def measure(self, completed, repeat):
+        timings = []
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+            list(Order.objects.queue().values_list('pk', flat=True)[:100])
+            timings.append(time.perf_counter() - started_at)
+        self.stdout.write(
+            f'Выполненных заказов: {completed:>9}, '
+            f'медиана {statistics.median(timings) * 1000:.2f} мс, '
+            f'максимум {max(timings) * 1000:.2f} мс'
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.catalog import get_catalog_stats, get_catalog_version
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания и промахи кэша каталога товаров'
+
+    def handle(self, *args, **options):
+        stats = get_catalog_stats()
+        requests_count = stats['hits'] + stats['misses']
+        hit_rate = stats['hits'] / requests_count if requests_count else 0
+        self.stdout.write(f'Версия каталога: {get_catalog_version()}')
+        self.stdout.write(f'Попаданий: {stats["hits"]}, промахов: {stats["misses"]} ({hit_rate:.1%} попаданий)')
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from foodcartapp.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Ищет заказы, у которых сохранённая стоимость не совпадает с суммой позиций'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Пересчитать стоимость расходящихся заказов')
+
+    def handle(self, *args, **options):
+        drifted_orders = (
+            Order.objects
+            .with_computed_total_price()
+            .exclude(total_price=F('computed_total_price'))
+        )
+        drifted = list(drifted_orders.values_list('pk', 'total_price', 'computed_total_price'))
+        for pk, total_price, computed_total_price in drifted:
+            self.stdout.write(f'Заказ {pk}: сохранено {total_price}, по позициям {computed_total_price}')
+
+        if options['fix'] and drifted:
+            Order.objects.filter(pk__in=[pk for pk, *_ in drifted]).update_total_prices()
+            self.stdout.write(f'Исправлено заказов: {len(drifted)}')
+        elif not drifted:
+            self.stdout.write('Расхождений нет')
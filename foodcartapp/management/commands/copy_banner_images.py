@@ -0,0 +1,23 @@
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import Banner
+
+
+class Command(BaseCommand):
+    help = 'Копирует недостающие картинки баннеров из каталога assets в media'
+
+    def handle(self, *args, **options):
+        copied = 0
+        for image in Banner.objects.values_list('image', flat=True).distinct():
+            source = os.path.join(settings.BASE_DIR, 'assets', image)
+            if default_storage.exists(image) or not os.path.isfile(source):
+                continue
+            with open(source, 'rb') as image_file:
+                default_storage.save(image, File(image_file))
+            copied += 1
+        self.stdout.write(f'Скопировано картинок: {copied}')
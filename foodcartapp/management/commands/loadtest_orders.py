@@ -0,0 +1,66 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from foodcartapp.models import Product
+
+ENDPOINTS = {
+    'sync': '/api/order/',
+    'async': '/api/order/async/',
+}
+
+
+class Command(BaseCommand):
+    help = 'Нагружает заказами синхронный и асинхронный API и сравнивает запросы в секунду и p99'
+
+    def add_arguments(self, parser):
+        parser.add_argument('base_url', help='Адрес запущенного сайта, например http://127.0.0.1:8000')
+        parser.add_argument('--requests', type=int, default=500, help='Сколько заказов отправить в каждый API')
+        parser.add_argument('--concurrency', type=int, default=50, help='Сколько запросов держать одновременно')
+        parser.add_argument('--endpoint', choices=ENDPOINTS, action='append',
+                            help='Какой API нагружать, по умолчанию оба')
+
+    def handle(self, *args, **options):
+        product_id = Product.objects.available().values_list('pk', flat=True).first()
+        if product_id is None:
+            raise CommandError('Нет товаров в продаже — нечего заказывать')
+
+        for endpoint in options['endpoint'] or ENDPOINTS:
+            url = options['base_url'].rstrip('/') + ENDPOINTS[endpoint]
+            latencies, errors, elapsed = self.run_load(url, product_id, options['requests'], options['concurrency'])
+            self.report(endpoint, latencies, errors, elapsed)
+
+    def run_load(self, url, product_id, requests_count, concurrency):
+        session = requests.Session()
+        session.mount('http', requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+
+        def post_order(number):
+            started_at = time.perf_counter()
+            response = session.post(url, json={
+                'firstname': 'Нагрузка',
+                'lastname': f'Тест {number}',
+                'phonenumber': '+79001234567',
+                'address': 'Москва, Красная площадь, 1',
+                'products': [{'product': product_id, 'quantity': 1}],
+            })
+            return time.perf_counter() - started_at, response.status_code != 201
+
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(post_order, range(requests_count)))
+        elapsed = time.perf_counter() - started_at
+
+        latencies = sorted(latency for latency, _ in results)
+        errors = sum(failed for _, failed in results)
+        return latencies, errors, elapsed
+
+    def report(self, endpoint, latencies, errors, elapsed):
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f'{endpoint}: {len(latencies) / elapsed:.1f} запросов/с, '
+            f'медиана {statistics.median(latencies) * 1000:.0f} мс, '
+            f'p99 {p99 * 1000:.0f} мс, ошибок {errors}'
+        )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рестораны, способные выполнить необработанные заказы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Сколько заказов пересчитывать за раз')
+
+    def handle(self, *args, **options):
+        order_ids = list(Order.objects.exclude(status='Completed').values_list('pk', flat=True))
+        batch_size = options['batch_size']
+        for start in range(0, len(order_ids), batch_size):
+            Order.objects.filter(pk__in=order_ids[start:start + batch_size]).refresh_candidates()
+        self.stdout.write(f'Пересчитано заказов: {len(order_ids)}')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import Order, Restaurant
+from places.utils import save_places
+
+
+class Command(BaseCommand):
+    help = 'Геокодирует адреса ресторанов и необработанных заказов, которых ещё нет в кэше'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Обновить координаты даже для адресов со свежим кэшем')
+
+    def handle(self, *args, **options):
+        addresses = set(Restaurant.objects.exclude(address='').values_list('address', flat=True))
+        addresses |= set(Order.objects.exclude(status='Completed').values_list('address', flat=True))
+        geocoded = save_places(addresses, force=options['all'])
+        self.stdout.write(f'Геокодировано адресов: {geocoded}')
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:19
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_total_prices(apps, schema_editor):
+    Order = apps.get_model('foodcartapp', 'Order')
+    ProductSet = apps.get_model('foodcartapp', 'ProductSet')
+    totals = (
+        ProductSet.objects
+        .filter(order=OuterRef('pk'))
+        .values('order')
+        .annotate(total=Sum(F('quantity') * F('price')))
+        .values('total')
+    )
+    Order.objects.update(total_price=Coalesce(Subquery(totals), Value(0), output_field=models.DecimalField()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0056_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='total_price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Стоимость заказа'),
+        ),
+        migrations.RunPython(fill_total_prices, migrations.RunPython.noop),
+    ]
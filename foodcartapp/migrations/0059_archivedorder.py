@@ -0,0 +1,49 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import phonenumber_field.modelfields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0058_order_queue_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False, verbose_name='Номер заказа')),
+                ('firstname', models.CharField(max_length=200, verbose_name='Имя')),
+                ('lastname', models.CharField(max_length=200, verbose_name='Фамилия')),
+                ('phonenumber', phonenumber_field.modelfields.PhoneNumberField(max_length=128, region='RU', verbose_name='Телефон')),
+                ('address', models.CharField(max_length=200, verbose_name='Адрес доставки')),
+                ('status', models.CharField(choices=[('Unprocessed', 'Необработанный'), ('Assembling', 'Cборка'), ('Delivery', 'Доставка'), ('Completed', 'Выполнен')], max_length=200, verbose_name='Статус')),
+                ('comment', models.CharField(blank=True, max_length=200, null=True, verbose_name='Комментарий')),
+                ('created_at', models.DateTimeField(db_index=True, verbose_name='Дата создания')),
+                ('called_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата звонка')),
+                ('delivered_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата доставки')),
+                ('payment_method', models.CharField(choices=[('Card', 'Картой на сайте'), ('Cash', 'Наличными')], max_length=200, verbose_name='Способ оплаты')),
+                ('total_price', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Стоимость заказа')),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата архивации')),
+                ('performer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archived_orders', to='foodcartapp.restaurant', verbose_name='Ресторан')),
+            ],
+            options={
+                'verbose_name': 'архивный заказ',
+                'verbose_name_plural': 'архивные заказы',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedProductSet',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1, verbose_name='Количество')),
+                ('price', models.DecimalField(decimal_places=2, default=0.0, max_digits=8)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sets', to='foodcartapp.archivedorder')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_sets', to='foodcartapp.product')),
+            ],
+        ),
+    ]
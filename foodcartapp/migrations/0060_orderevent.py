@@ -0,0 +1,30 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0059_archivedorder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('order_id', models.IntegerField(db_index=True, verbose_name='номер заказа')),
+                ('kind', models.CharField(choices=[('created', 'Заказ создан'), ('status_changed', 'Статус изменён'), ('performer_assigned', 'Назначен ресторан')], max_length=20, verbose_name='событие')),
+                ('status', models.CharField(blank=True, choices=[('Unprocessed', 'Необработанный'), ('Assembling', 'Cборка'), ('Delivery', 'Доставка'), ('Completed', 'Выполнен')], max_length=200, verbose_name='статус')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='дата события')),
+                ('performer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_events', to='foodcartapp.restaurant', verbose_name='ресторан')),
+            ],
+            options={
+                'verbose_name': 'событие заказа',
+                'verbose_name_plural': 'события заказов',
+            },
+        ),
+    ]
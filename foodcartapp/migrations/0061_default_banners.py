@@ -0,0 +1,29 @@
+from django.db import migrations
+
+# Banners that were hardcoded in banners_list_api before they moved to the database.
+# Their pictures are copied to media by the copy_banner_images command.
+DEFAULT_BANNERS = [
+    {'title': 'Burger', 'image': 'burger.jpg', 'text': 'Tasty Burger at your door step'},
+    {'title': 'Spices', 'image': 'food.jpg', 'text': 'All Cuisines'},
+    {'title': 'New York', 'image': 'tasty.jpg', 'text': 'Food is incomplete without a tasty dessert'},
+]
+
+
+def create_default_banners(apps, schema_editor):
+    Banner = apps.get_model('foodcartapp', 'Banner')
+    if Banner.objects.exists():
+        return
+
+    for position, banner in enumerate(DEFAULT_BANNERS):
+        Banner.objects.create(position=position, **banner)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0060_orderevent'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_default_banners, migrations.RunPython.noop),
+    ]
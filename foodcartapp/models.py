@@ -1,18 +1,19 @@
-import requests
-
 from collections import defaultdict
-from geopy import distance
+from datetime import timedelta
+from itertools import islice
 
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
 from django.core.validators import MinValueValidator
-from django.db.models import Sum, F
+from django.db.models import Sum, F, OuterRef, Prefetch, Q, Subquery, Value, prefetch_related_objects
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from phonenumber_field.modelfields import PhoneNumberField
 
-from places.models import Place
-from places.utils import fetch_coordinates
-from star_burger.custom_errors import YandexApiError
-from star_burger.settings import YANDEX_API_KEY
+from places.distances import distance_matrix, sort_by_distance
+from places.spatial import GridIndex
+from places.utils import get_places
+from .availability import RestaurantAvailability
 
 
 class Restaurant(models.Model):
@@ -133,51 +134,159 @@ class RestaurantMenuItem(models.Model):
 
 
 class OrderQuerySet(models.QuerySet):
-    def total_price(self):
-        price = Sum(F('sets__quantity') * F('sets__price'))
-        return self.prefetch_related('sets').annotate(total_price=price)
+    def queue(self):
+        """Orders managers still have to handle, in the order of `order_open_queue_idx`."""
+        return self.exclude(status='Completed').order_by('-status', 'created_at', 'id')
+
+    def queue_after(self, status, created_at, pk):
+        """Orders that come after the given one in `queue()`, for keyset pagination."""
+        return self.filter(
+            Q(status__lt=status)
+            | Q(status=status, created_at__gt=created_at)
+            | Q(status=status, created_at=created_at, id__gt=pk)
+        )
+
+    def for_restaurant(self, restaurant):
+        """Orders the restaurant performs or could perform."""
+        candidates = OrderCandidate.objects.filter(restaurant=restaurant).values('order')
+        return self.filter(Q(performer=restaurant) | Q(pk__in=candidates))
+
+    @staticmethod
+    def get_computed_total_price():
+        totals = (
+            ProductSet.objects
+            .filter(order=OuterRef('pk'))
+            .values('order')
+            .annotate(total=Sum(F('quantity') * F('price')))
+            .values('total')
+        )
+        return Coalesce(Subquery(totals), Value(0), output_field=models.DecimalField())
+
+    def with_computed_total_price(self):
+        return self.annotate(computed_total_price=self.get_computed_total_price())
+
+    def update_total_prices(self):
+        """Recompute the stored `total_price` of these orders with one UPDATE."""
+        return self.update(total_price=self.get_computed_total_price())
 
     def get_available_restaurants(self):
-        restaurant_and_menus = RestaurantMenuItem.objects.prefetch_related('product', 'restaurant')
-        available_products_in_rests = defaultdict(list)
-        for rest_product in restaurant_and_menus:
-            if rest_product.availability:
-                available_products_in_rests[rest_product.restaurant].append(rest_product.product)
-                available_products_in_rests[rest_product.restaurant].append(rest_product.restaurant.address)
-
-        for order in self:
-            order.available_in = []
-            product_set = order.sets.filter(order=order).prefetch_related('product')
-            for restaurant, data in available_products_in_rests.items():
-                if all(i in data[0:-1] for i in [x.product for x in product_set]):
-                    try:
-                        order_place = Place.objects.get(address=order.address)
-                        order_lon, order_lat = order_place.longitude, order_place.latitude
-                    except Place.DoesNotExist:
-                        order_lon, order_lat = fetch_coordinates(YANDEX_API_KEY, order.address)
-                        order_place = Place.objects.create(address=order.address, latitude=order_lat,
-                                                           longitude=order_lon)
-                        order_place.save()
-                    except YandexApiError as e:
-                        print(e)
-                        order_lon, order_lat = None, None
-                    try:
-                        rest_place = Place.objects.get(address=restaurant.address)
-                        rest_lon, rest_lat = rest_place.longitude, rest_place.latitude
-                    except Place.DoesNotExist:
-                        rest_lon, rest_lat = fetch_coordinates(YANDEX_API_KEY, restaurant.address)
-                        rest_place = Place.objects.create(address=restaurant.address, latitude=rest_lat,
-                                                          longitude=rest_lon)
-                        rest_place.save()
-                    except YandexApiError as e:
-                        print(e)
-                        rest_lon, rest_lat = None, None
-                    order.distance_from_rest_to_recipient = distance.distance((rest_lat, rest_lon),
-                                                                              (order_lat, order_lon)).km
-                    order.available_in.append(restaurant.name)
-            if not order.available_in:
-                order.available_in = ['Ни один ресторан не может выполнить заказ!']
-        return list(self)
+        orders = list(self)
+        if not orders:
+            return orders
+
+        availability = RestaurantAvailability.load()
+        restaurants = Restaurant.objects.in_bulk(availability.restaurant_ids)
+
+        orders_products = defaultdict(set)
+        product_sets = (
+            ProductSet.objects
+            .filter(order__in=[order.pk for order in orders])
+            .values_list('order_id', 'product_id')
+        )
+        for order_id, product_id in product_sets:
+            orders_products[order_id].add(product_id)
+
+        addresses = {order.address for order in orders}
+        addresses |= {restaurant.address for restaurant in restaurants.values()}
+        places = get_places(addresses)
+
+        located_restaurants = {}
+        unlocated_restaurant_ids = []
+        for restaurant in restaurants.values():
+            coordinates = places.get(restaurant.address)
+            if coordinates and None not in coordinates:
+                located_restaurants[restaurant.pk] = coordinates
+            else:
+                unlocated_restaurant_ids.append(restaurant.pk)
+        restaurants_grid = GridIndex(located_restaurants)
+        radius_km = settings.RESTAURANT_SEARCH_RADIUS_KM
+
+        located_orders = []
+        nearby_ids = {}
+        for order in orders:
+            order.coordinates_pending = order.address not in places
+            order_coordinates = places.get(order.address)
+            if order_coordinates and None not in order_coordinates:
+                located_orders.append(order)
+                nearby_ids[order.pk] = set(restaurants_grid.nearby(*order_coordinates, radius_km))
+
+        # One matrix for the whole batch, so its size decides between geodesic and haversine
+        column_ids = sorted(set().union(*nearby_ids.values()))
+        columns = {pk: column for column, pk in enumerate(column_ids)}
+        matrix = distance_matrix(
+            [places[order.address] for order in located_orders],
+            [located_restaurants[pk] for pk in column_ids],
+        )
+        rows = {order.pk: row for order, row in zip(located_orders, matrix)}
+
+        for order in orders:
+            restaurant_ids = availability.restaurants_for(orders_products[order.pk])
+            if order.pk not in rows:
+                order.available_in = [(restaurants[pk], None) for pk in sorted(restaurant_ids)]
+                continue
+
+            order_columns = sorted(columns[pk] for pk in nearby_ids[order.pk] & restaurant_ids)
+            order.available_in = [
+                (restaurants[column_ids[column]], distance_km)
+                for column, distance_km in sort_by_distance(rows[order.pk], order_columns)
+                if distance_km is not None and distance_km <= radius_km
+            ]
+            order.available_in += [
+                (restaurants[pk], None)
+                for pk in sorted(unlocated_restaurant_ids)
+                if pk in restaurant_ids
+            ]
+        return orders
+
+    def refresh_candidates(self, restaurant_ids=None):
+        """Recompute `OrderCandidate` rows of these orders.
+
+        If `restaurant_ids` are given, only rows of these restaurants are touched.
+        """
+        orders = self.get_available_restaurants()
+        candidates = [
+            OrderCandidate(order=order, restaurant=restaurant, distance_km=distance_km)
+            for order in orders
+            for restaurant, distance_km in order.available_in
+            if restaurant_ids is None or restaurant.pk in restaurant_ids
+        ]
+        outdated_candidates = OrderCandidate.objects.filter(order__in=[order.pk for order in orders])
+        if restaurant_ids is not None:
+            outdated_candidates = outdated_candidates.filter(restaurant__in=restaurant_ids)
+
+        with transaction.atomic():
+            outdated_candidates.delete()
+            OrderCandidate.objects.bulk_create(candidates)
+
+    def with_candidates(self):
+        """Load orders with restaurants from `OrderCandidate`, nearest first."""
+        return attach_candidates(list(self))
+
+    def iter_with_candidates(self, chunk_size):
+        """Stream orders in chunks, loading candidates for one chunk at a time."""
+        orders = self.iterator(chunk_size=chunk_size)
+        while True:
+            chunk = list(islice(orders, chunk_size))
+            if not chunk:
+                return
+            yield from attach_candidates(chunk)
+
+
+def attach_candidates(orders):
+    candidates = (
+        OrderCandidate.objects
+        .select_related('restaurant')
+        .order_by(F('distance_km').asc(nulls_last=True), 'restaurant_id')
+    )
+    prefetch_related_objects(orders, Prefetch('candidates', queryset=candidates))
+    places = get_places(order.address for order in orders)
+    for order in orders:
+        order.available_in = [
+            (candidate.restaurant, candidate.distance_km)
+            for candidate in order.candidates.all()
+        ]
+        order.coordinates_pending = order.address not in places
+    return orders
 
 
 class Order(models.Model):
@@ -210,6 +319,8 @@ class Order(models.Model):
                                       choices=PAYMENT_METHODS, db_index=True)
     performer = models.ForeignKey(Restaurant, on_delete=models.PROTECT, verbose_name='Ресторан', default=None,
                                   blank=True, null=True, related_name='orders')
+    total_price = models.DecimalField('Стоимость заказа', max_digits=10, decimal_places=2, default=0,
+                                      validators=[MinValueValidator(0)])
 
     objects = OrderQuerySet.as_manager()
 
@@ -222,6 +333,16 @@ class Order(models.Model):
     class Meta:
         verbose_name = 'заказ'
         verbose_name_plural = 'заказы'
+        indexes = [
+            models.Index(fields=['-status', 'created_at', 'id'], name='order_status_created_idx'),
+            # Manager queue: the index stays small however many orders are completed.
+            # Backends without partial indexes skip it.
+            models.Index(
+                fields=['-status', 'created_at', 'id'],
+                condition=~Q(status='Completed'),
+                name='order_open_queue_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.lastname} {self.firstname} - {self.address}'
@@ -232,3 +353,155 @@ class ProductSet(models.Model):
     quantity = models.PositiveIntegerField('Количество', default=1, blank=True)
     order = models.ForeignKey(Order, on_delete=models.PROTECT, related_name='sets')
     price = models.DecimalField(max_digits=8, decimal_places=2, default=0.00, validators=[MinValueValidator(0)])
+
+
+class ArchivedOrder(models.Model):
+    id = models.IntegerField(primary_key=True, verbose_name='Номер заказа')
+    firstname = models.CharField(max_length=200, verbose_name='Имя')
+    lastname = models.CharField(max_length=200, verbose_name='Фамилия')
+    phonenumber = PhoneNumberField(region='RU', verbose_name='Телефон')
+    address = models.CharField(max_length=200, verbose_name='Адрес доставки')
+    status = models.CharField(max_length=200, verbose_name='Статус', choices=Order.STATUSES)
+    comment = models.CharField(max_length=200, blank=True, null=True, verbose_name='Комментарий')
+    created_at = models.DateTimeField(db_index=True, verbose_name='Дата создания')
+    called_at = models.DateTimeField(null=True, blank=True, verbose_name='Дата звонка')
+    delivered_at = models.DateTimeField(null=True, blank=True, verbose_name='Дата доставки')
+    payment_method = models.CharField(max_length=200, verbose_name='Способ оплаты', choices=Order.PAYMENT_METHODS)
+    performer = models.ForeignKey(Restaurant, on_delete=models.PROTECT, verbose_name='Ресторан',
+                                  blank=True, null=True, related_name='archived_orders')
+    total_price = models.DecimalField('Стоимость заказа', max_digits=10, decimal_places=2, default=0)
+    archived_at = models.DateTimeField(default=timezone.now, verbose_name='Дата архивации')
+
+    class Meta:
+        verbose_name = 'архивный заказ'
+        verbose_name_plural = 'архивные заказы'
+
+    def __str__(self):
+        return f'{self.lastname} {self.firstname} - {self.address}'
+
+
+class ArchivedProductSet(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='archived_sets')
+    quantity = models.PositiveIntegerField('Количество', default=1)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='sets')
+    price = models.DecimalField(max_digits=8, decimal_places=2, default=0.00)
+
+
+class OrderCandidate(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='candidates', verbose_name='Заказ')
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='order_candidates',
+                                   verbose_name='Ресторан')
+    distance_km = models.FloatField(null=True, blank=True, verbose_name='Расстояние до клиента, км')
+
+    class Meta:
+        verbose_name = 'ресторан, способный выполнить заказ'
+        verbose_name_plural = 'рестораны, способные выполнить заказ'
+        unique_together = [
+            ['order', 'restaurant']
+        ]
+
+
+def get_events_settled_at():
+    return timezone.now() - timedelta(seconds=settings.ORDER_EVENTS_SETTLE_SECONDS)
+
+
+class OrderEventQuerySet(models.QuerySet):
+    def settled(self):
+        """Events older than `ORDER_EVENTS_SETTLE_SECONDS`.
+
+        Event ids are taken at insert time but become visible at commit, so a
+        slow transaction can show up below ids that were already read. Order
+        transactions commit well within the settle time, so no event can
+        appear below a settled one any more.
+        """
+        return self.filter(created_at__lt=get_events_settled_at())
+
+    def get_settled_cursor(self):
+        """Id of the latest settled event, or 0."""
+        return self.settled().order_by('-id').values_list('id', flat=True).first() or 0
+
+
+class OrderEvent(models.Model):
+    CREATED = 'created'
+    STATUS_CHANGED = 'status_changed'
+    PERFORMER_ASSIGNED = 'performer_assigned'
+    KINDS = [
+        (CREATED, 'Заказ создан'),
+        (STATUS_CHANGED, 'Статус изменён'),
+        (PERFORMER_ASSIGNED, 'Назначен ресторан'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    # Not a foreign key: the log outlives orders moved to the archive
+    order_id = models.IntegerField('номер заказа', db_index=True)
+    kind = models.CharField('событие', max_length=20, choices=KINDS)
+    status = models.CharField('статус', max_length=200, choices=Order.STATUSES, blank=True)
+    performer = models.ForeignKey(Restaurant, on_delete=models.SET_NULL, verbose_name='ресторан',
+                                  blank=True, null=True, related_name='order_events')
+    created_at = models.DateTimeField('дата события', default=timezone.now)
+
+    objects = OrderEventQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'событие заказа'
+        verbose_name_plural = 'события заказов'
+
+    def __str__(self):
+        return f'{self.order_id}: {self.get_kind_display()}'
+
+    @classmethod
+    def for_order(cls, order, kind):
+        return cls(order_id=order.pk, kind=kind, status=order.status, performer_id=order.performer_id)
+
+
+class Banner(models.Model):
+    title = models.CharField('заголовок', max_length=50)
+    image = models.ImageField('картинка')
+    text = models.CharField('текст', max_length=200, blank=True)
+    position = models.PositiveIntegerField('порядок показа', default=0, db_index=True)
+    is_active = models.BooleanField('показывать', default=True, db_index=True)
+    active_from = models.DateTimeField('показывать с', null=True, blank=True)
+    active_until = models.DateTimeField('показывать до', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'баннер'
+        verbose_name_plural = 'баннеры'
+        ordering = ['position', 'pk']
+
+    def __str__(self):
+        return self.title
+
+    def is_shown(self, now):
+        if not self.is_active:
+            return False
+        if self.active_from and now < self.active_from:
+            return False
+        if self.active_until and now >= self.active_until:
+            return False
+        return True
+
+
+class IdempotencyKeyQuerySet(models.QuerySet):
+    def fresh(self):
+        expired_at = timezone.now() - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+        return self.filter(created_at__gte=expired_at)
+
+    def expired(self):
+        expired_at = timezone.now() - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+        return self.filter(created_at__lt=expired_at)
+
+
+class IdempotencyKey(models.Model):
+    key = models.CharField('ключ', max_length=255, unique=True)
+    response_status = models.PositiveSmallIntegerField('код ответа', null=True, blank=True)
+    response_body = models.JSONField('тело ответа', null=True, blank=True)
+    created_at = models.DateTimeField('дата запроса', default=timezone.now, db_index=True)
+
+    objects = IdempotencyKeyQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'ключ идемпотентности'
+        verbose_name_plural = 'ключи идемпотентности'
+
+    def __str__(self):
+        return self.key
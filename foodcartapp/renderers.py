@@ -0,0 +1,86 @@
+import gzip
+from decimal import Decimal
+
+import brotli
+import orjson
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer
+
+
+def encode_default(obj):
+    # Same as DjangoJSONEncoder: prices stay exact strings
+    if isinstance(obj, (Decimal, Promise)):
+        return str(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def dumps(data, pretty=False):
+    option = orjson.OPT_NON_STR_KEYS
+    if pretty:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(data, default=encode_default, option=option)
+
+
+def wants_pretty_json(request):
+    """Pretty-printing is for debugging only: `?pretty=1`."""
+    return request is not None and request.GET.get('pretty') in ('1', 'true')
+
+
+class FastJsonResponse(HttpResponse):
+    def __init__(self, data, pretty=False, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(dumps(data, pretty), **kwargs)
+
+
+def precompress(content):
+    """Return `content` in every encoding `PrecompressedJsonResponse` can send."""
+    return {
+        'br': brotli.compress(content, quality=11),
+        'gzip': gzip.compress(content, compresslevel=9, mtime=0),
+        'identity': content,
+    }
+
+
+def choose_content_encoding(request):
+    """Pick the best of br, gzip and identity allowed by Accept-Encoding."""
+    accepted = {}
+    for coding in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = coding.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0
+        accepted[name.strip().lower()] = quality
+
+    for encoding in ('br', 'gzip'):
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return 'identity'
+
+
+class PrecompressedJsonResponse(HttpResponse):
+    """Send one of the `precompress()` variants without compressing on the fly."""
+
+    def __init__(self, variants, encoding, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(variants[encoding], **kwargs)
+        if encoding != 'identity':
+            self['Content-Encoding'] = encoding
+        patch_vary_headers(self, ['Accept-Encoding'])
+
+
+class FastJSONRenderer(BaseRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        request = (renderer_context or {}).get('request')
+        return dumps(data, pretty=wants_pretty_json(request))
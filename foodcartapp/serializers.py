@@ -1,11 +1,33 @@
 from phonenumber_field.serializerfields import PhoneNumberField
-from rest_framework.fields import CharField
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import BooleanField, CharField, SerializerMethodField
+from rest_framework.relations import PrimaryKeyRelatedField
 from rest_framework.serializers import ModelSerializer
 
-from foodcartapp.models import Order, ProductSet
+from foodcartapp.catalog import get_available_product_prices
+from foodcartapp.models import Order, OrderEvent, Product, ProductSet
+
+
+class ProductIdField(PrimaryKeyRelatedField):
+    """Product primary key, checked for existence by `OrderSerializer` in bulk."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+def get_total_price(products_data):
+    """Order total from validated `products` of `OrderSerializer`."""
+    return sum(product_data['price'] * product_data['quantity'] for product_data in products_data)
 
 
 class OrderItemSerializer(ModelSerializer):
+    product = ProductIdField(queryset=Product.objects.all())
+
     class Meta:
         model = ProductSet
         fields = ['product', 'quantity']
@@ -17,13 +39,66 @@ class OrderSerializer(ModelSerializer):
     phonenumber = PhoneNumberField(region='RU')
     products = OrderItemSerializer(many=True, allow_empty=False, write_only=True)
 
+    def validate_products(self, products):
+        prices = get_available_product_prices()
+        does_not_exist = ProductIdField.default_error_messages['does_not_exist']
+
+        errors = []
+        for product_data in products:
+            product_id = product_data['product']
+            if product_id in prices:
+                product_data['price'] = prices[product_id]
+                errors.append({})
+            else:
+                errors.append({'product': [does_not_exist.format(pk_value=product_id)]})
+        if any(errors):
+            raise ValidationError(errors)
+        return products
+
     def create(self, validated_data):
         products_data = validated_data.pop('products')
-        order = Order.objects.create(**validated_data)
-        for product_data in products_data:
-            ProductSet.objects.create(order=order, price=product_data['product'].price, **product_data)
+        order = Order.objects.create(total_price=get_total_price(products_data), **validated_data)
+        ProductSet.objects.bulk_create([
+            ProductSet(
+                order=order,
+                product_id=product_data['product'],
+                quantity=product_data['quantity'],
+                price=product_data['price'],
+            ) for product_data in products_data
+        ])
         return order
 
     class Meta:
         model = Order
         fields = ['firstname', 'lastname', 'phonenumber', 'address', 'products']
+
+
+class QueueOrderSerializer(ModelSerializer):
+    """Order of the manager queue, loaded with `OrderQuerySet.with_candidates()`."""
+    coordinates_pending = BooleanField(read_only=True)
+    restaurants = SerializerMethodField()
+
+    def get_restaurants(self, order):
+        return [
+            {'id': restaurant.pk, 'name': restaurant.name, 'distance_km': distance_km}
+            for restaurant, distance_km in order.available_in
+        ]
+
+    class Meta:
+        model = Order
+        fields = [
+            'id', 'status', 'payment_method', 'total_price', 'firstname', 'lastname', 'phonenumber',
+            'address', 'comment', 'created_at', 'performer', 'coordinates_pending', 'restaurants',
+        ]
+
+
+class OrderEventSerializer(ModelSerializer):
+    order = SerializerMethodField()
+
+    def get_order(self, event):
+        order = getattr(event, 'order', None)
+        return QueueOrderSerializer(order).data if order else None
+
+    class Meta:
+        model = OrderEvent
+        fields = ['id', 'order_id', 'kind', 'status', 'performer', 'created_at', 'order']
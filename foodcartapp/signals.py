@@ -0,0 +1,152 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from places.models import Place
+from places.normalization import normalize_address
+from places.signals import places_geocoded
+from .banners import bump_banners_version
+from .catalog import bump_catalog_version
+from .models import Banner, Order, OrderEvent, Product, ProductCategory, ProductSet, Restaurant, RestaurantMenuItem
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def invalidate_catalog(sender, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Banner)
+@receiver(post_delete, sender=Banner)
+def invalidate_banners(sender, **kwargs):
+    bump_banners_version()
+
+
+_muted = threading.local()
+
+
+@contextmanager
+def mute_order_signals():
+    """Skip order recalculation, e.g. while orders are moved to the archive."""
+    _muted.active = True
+    try:
+        yield
+    finally:
+        _muted.active = False
+
+
+def order_signals_muted():
+    return getattr(_muted, 'active', False)
+
+
+def get_open_orders():
+    return Order.objects.exclude(status='Completed')
+
+
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def refresh_menu_item_candidates(sender, instance, **kwargs):
+    orders = get_open_orders().filter(sets__product=instance.product_id).distinct()
+    orders.refresh_candidates(restaurant_ids={instance.restaurant_id})
+
+
+@receiver(post_save, sender=Restaurant)
+def refresh_restaurant_candidates(sender, instance, created, **kwargs):
+    if created:
+        return
+    # A new address may bring the restaurant in range of orders it wasn't a candidate for
+    menu_products = RestaurantMenuItem.objects.filter(restaurant=instance).values('product')
+    orders = get_open_orders().filter(
+        Q(sets__product__in=menu_products) | Q(candidates__restaurant=instance)
+    ).distinct()
+    orders.refresh_candidates(restaurant_ids={instance.pk})
+
+
+@receiver(post_save, sender=Order)
+def refresh_order_candidates(sender, instance, created, **kwargs):
+    if order_signals_muted():
+        return
+    # New orders get their candidates after their products are saved
+    if created:
+        return
+    saved_state = getattr(instance, '_saved_state', None)
+    if not saved_state or instance.status == 'Completed':
+        return
+    _, _, saved_address = saved_state
+    # Status and performer changes don't affect which restaurants can cook the order
+    if instance.address != saved_address:
+        Order.objects.filter(pk=instance.pk).refresh_candidates()
+
+
+@receiver(post_save, sender=ProductSet)
+@receiver(post_delete, sender=ProductSet)
+def refresh_product_set_candidates(sender, instance, **kwargs):
+    if order_signals_muted():
+        return
+    Order.objects.filter(pk=instance.order_id).refresh_candidates()
+
+
+@receiver(post_save, sender=ProductSet)
+@receiver(post_delete, sender=ProductSet)
+def update_order_total_price(sender, instance, **kwargs):
+    if order_signals_muted():
+        return
+    Order.objects.filter(pk=instance.order_id).update_total_prices()
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_state(sender, instance, **kwargs):
+    if instance._state.adding:
+        return
+    instance._saved_state = (
+        Order.objects
+        .filter(pk=instance.pk)
+        .values_list('status', 'performer_id', 'address')
+        .first()
+    )
+
+
+@receiver(post_save, sender=Order)
+def log_order_events(sender, instance, created, **kwargs):
+    if created:
+        OrderEvent.for_order(instance, OrderEvent.CREATED).save()
+        return
+    saved_state = getattr(instance, '_saved_state', None)
+    if not saved_state:
+        return
+    saved_status, saved_performer_id, _ = saved_state
+    events = []
+    if instance.status != saved_status:
+        events.append(OrderEvent.for_order(instance, OrderEvent.STATUS_CHANGED))
+    if instance.performer_id and instance.performer_id != saved_performer_id:
+        events.append(OrderEvent.for_order(instance, OrderEvent.PERFORMER_ASSIGNED))
+    OrderEvent.objects.bulk_create(events)
+
+
+def get_geocoded_ids(queryset, addresses):
+    """Pks of objects in `queryset` whose address normalizes to one of `addresses`."""
+    place_addresses = Place.objects.filter(normalized_address__in=addresses).values('address')
+    ids = set(queryset.filter(address__in=place_addresses).values_list('pk', flat=True))
+    # Other spellings of an address have no Place of their own, so only they need normalizing
+    variants = queryset.exclude(address__in=Place.objects.values('address')).values_list('pk', 'address')
+    ids |= {pk for pk, address in variants if normalize_address(address) in addresses}
+    return ids
+
+
+@receiver(places_geocoded)
+def refresh_geocoded_candidates(sender, addresses, **kwargs):
+    order_ids = get_geocoded_ids(get_open_orders(), addresses)
+    if order_ids:
+        Order.objects.filter(pk__in=order_ids).refresh_candidates()
+
+    restaurant_ids = get_geocoded_ids(Restaurant.objects.all(), addresses)
+    if restaurant_ids:
+        orders = get_open_orders().filter(candidates__restaurant__in=restaurant_ids).distinct()
+        orders.refresh_candidates(restaurant_ids=restaurant_ids)
@@ -0,0 +1,480 @@
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+from datetime import timedelta
+
+import brotli
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from places.distances import distance_matrix
+from places.models import Place
+from places.normalization import normalize_address
+from places.signals import places_geocoded
+from .archive import find_order, get_all_orders_values
+from .models import (
+    ArchivedOrder,
+    ArchivedProductSet,
+    Banner,
+    Order,
+    OrderCandidate,
+    OrderEvent,
+    OrderQuerySet,
+    Product,
+    ProductSet,
+    Restaurant,
+    RestaurantMenuItem,
+)
+
+
+class OrdersTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [
+            Product.objects.create(name=f'Бургер {number}', price=100, image='burger.jpg')
+            for number in range(3)
+        ]
+        for number in range(3):
+            restaurant = Restaurant.objects.create(
+                name=f'Star Burger {number}',
+                address=f'Москва, ресторан {number}',
+                contact_phone='+79001234567',
+            )
+            Place.objects.create(address=restaurant.address, latitude=55.7 + number / 100, longitude=37.6)
+            for product in cls.products[:number + 1]:
+                RestaurantMenuItem.objects.create(restaurant=restaurant, product=product)
+
+    def create_orders(self, count):
+        for number in range(count):
+            order = Order.objects.create(
+                firstname='Иван',
+                lastname='Иванов',
+                phonenumber='+79001234567',
+                address=f'Москва, заказ {number}',
+            )
+            Place.objects.get_or_create(address=order.address, latitude=55.75, longitude=37.61)
+            for product in self.products[:number % 3 + 1]:
+                ProductSet.objects.create(order=order, product=product, price=product.price)
+
+
+class GetAvailableRestaurantsTest(OrdersTestCase):
+    def test_query_count_does_not_depend_on_orders_count(self):
+        self.create_orders(2)
+        with self.assertNumQueries(5):
+            Order.objects.get_available_restaurants()
+
+        self.create_orders(20)
+        with self.assertNumQueries(5):
+            Order.objects.get_available_restaurants()
+
+    def test_restaurants_must_have_all_order_products(self):
+        self.create_orders(3)
+        orders = Order.objects.order_by('pk').get_available_restaurants()
+        self.assertEqual(
+            [[restaurant.name for restaurant, _ in order.available_in] for order in orders],
+            [
+                ['Star Burger 2', 'Star Burger 1', 'Star Burger 0'],
+                ['Star Burger 2', 'Star Burger 1'],
+                ['Star Burger 2'],
+            ],
+        )
+
+    def test_every_candidate_keeps_its_own_distance(self):
+        self.create_orders(1)
+        order, = Order.objects.get_available_restaurants()
+        distances = [distance_km for _, distance_km in order.available_in]
+        self.assertEqual(distances, sorted(distances))
+        self.assertAlmostEqual(distances[0], 3.4, places=1)
+
+    def test_distances_of_all_orders_are_computed_at_once(self):
+        self.create_orders(40)
+        with patch('foodcartapp.models.distance_matrix', wraps=distance_matrix) as matrix:
+            Order.objects.get_available_restaurants()
+        matrix.assert_called_once()
+        origins, destinations = matrix.call_args.args
+        self.assertEqual((len(origins), len(destinations)), (40, 3))
+
+    def test_far_away_restaurants_are_skipped(self):
+        self.create_orders(1)
+        with self.settings(RESTAURANT_SEARCH_RADIUS_KM=4):
+            order, = Order.objects.get_available_restaurants()
+        self.assertEqual([restaurant.name for restaurant, _ in order.available_in], ['Star Burger 2'])
+
+
+class OrderCandidateTest(OrdersTestCase):
+    def test_candidates_follow_menu_availability(self):
+        self.create_orders(3)
+        Order.objects.refresh_candidates()
+        self.assertEqual(OrderCandidate.objects.count(), 6)
+
+        menu_item = RestaurantMenuItem.objects.get(restaurant__name='Star Burger 2', product=self.products[2])
+        menu_item.availability = False
+        menu_item.save()
+
+        orders = Order.objects.order_by('pk').with_candidates()
+        self.assertEqual(
+            [[restaurant.name for restaurant, _ in order.available_in] for order in orders],
+            [
+                ['Star Burger 2', 'Star Burger 1', 'Star Burger 0'],
+                ['Star Burger 2', 'Star Burger 1'],
+                [],
+            ],
+        )
+
+    def test_moved_restaurant_becomes_candidate(self):
+        restaurant = Restaurant.objects.create(name='Star Burger Казань', address='Казань, ресторан',
+                                               contact_phone='+79001234567')
+        Place.objects.create(address=restaurant.address, latitude=55.79, longitude=49.1)
+        RestaurantMenuItem.objects.create(restaurant=restaurant, product=self.products[0])
+        self.create_orders(1)
+        self.assertFalse(OrderCandidate.objects.filter(restaurant=restaurant).exists())
+
+        Place.objects.create(address='Москва, новый ресторан', latitude=55.74, longitude=37.6)
+        restaurant.address = 'Москва, новый ресторан'
+        restaurant.save()
+
+        self.assertTrue(OrderCandidate.objects.filter(restaurant=restaurant).exists())
+
+    def test_only_address_changes_refresh_order_candidates(self):
+        self.create_orders(1)
+        order = Order.objects.get()
+        with patch.object(OrderQuerySet, 'refresh_candidates') as refresh_candidates:
+            order.status = 'Assembling'
+            order.save()
+            refresh_candidates.assert_not_called()
+
+            order.address = 'Москва, заказ 2'
+            order.save()
+            refresh_candidates.assert_called_once()
+
+    def test_geocoded_address_variants_get_candidates(self):
+        self.create_orders(1)
+        order = Order.objects.get()
+        Order.objects.filter(pk=order.pk).update(address='москва ,заказ 0')
+        OrderCandidate.objects.all().delete()
+
+        places_geocoded.send(sender=Place, addresses={normalize_address(order.address)})
+
+        self.assertEqual(OrderCandidate.objects.filter(order=order).count(), 3)
+
+    def test_reading_candidates_does_not_depend_on_restaurants_count(self):
+        self.create_orders(5)
+        Order.objects.refresh_candidates()
+        with self.assertNumQueries(3):
+            Order.objects.with_candidates()
+
+
+class CatalogApiTest(OrdersTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_catalog_is_served_from_cache_until_menu_changes(self):
+        response = self.client.get('/api/products/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.json()), 3)
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+        RestaurantMenuItem.objects.filter(product=self.products[2]).delete()
+        response = self.client.get('/api/products/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.json()), 2)
+
+    def test_conditional_get_returns_not_modified(self):
+        response = self.client.get('/api/products/')
+        etag = response['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.products[0].save()
+        response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_banners_support_conditional_get(self):
+        Banner.objects.create(title='Burger', image='burger.jpg')
+        response = self.client.get('/api/banners/')
+        self.assertIn('Last-Modified', response)
+        response = self.client.get('/api/banners/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get('/api/banners/?pretty=1', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_former_hardcoded_banners_are_migrated(self):
+        response = self.client.get('/api/banners/')
+        self.assertEqual([banner['title'] for banner in response.json()], ['Burger', 'Spices', 'New York'])
+
+    def test_banner_images_are_copied_from_assets(self):
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            call_command('copy_banner_images', stdout=StringIO())
+            self.assertCountEqual(os.listdir(media_root), ['burger.jpg', 'food.jpg', 'tasty.jpg'])
+
+    def test_banners_are_served_from_memory_until_changed(self):
+        Banner.objects.all().delete()
+        now = timezone.now()
+        Banner.objects.create(title='Spices', image='food.jpg', position=2)
+        Banner.objects.create(title='Burger', image='burger.jpg', position=1)
+        Banner.objects.create(title='Soon', image='tasty.jpg', active_from=now + timedelta(days=1))
+        self.client.get('/api/banners/')
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/banners/')
+        self.assertEqual([banner['title'] for banner in response.json()], ['Burger', 'Spices'])
+
+        Banner.objects.filter(title='Spices').update(is_active=False)
+        Banner.objects.get(title='Burger').save()
+        response = self.client.get('/api/banners/')
+        self.assertEqual([banner['title'] for banner in response.json()], ['Burger'])
+
+    def test_json_is_compact_unless_pretty_is_asked(self):
+        response = self.client.get('/api/products/')
+        self.assertNotIn(b'\n', response.content)
+        self.assertEqual(response.json()[0]['price'], '100.00')
+
+        response = self.client.get('/api/products/', {'pretty': '1'})
+        self.assertIn(b'\n  ', response.content)
+
+    def test_catalog_is_sent_precompressed(self):
+        plain = self.client.get('/api/products/').content
+
+        response = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(brotli.decompress(response.content), plain)
+
+        response = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='br;q=0, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content)), json.loads(plain))
+
+
+class RegisterOrderTest(OrdersTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def post_order(self, products, **headers):
+        return self.client.post('/api/order/', {
+            'firstname': 'Иван',
+            'lastname': 'Иванов',
+            'phonenumber': '+79001234567',
+            'address': 'Москва, заказ 1',
+            'products': products,
+        }, content_type='application/json', **headers)
+
+    def test_order_is_registered(self):
+        response = self.post_order([{'product': self.products[0].pk, 'quantity': 2}])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json()['firstname'], 'Иван')
+        order = Order.objects.get()
+        self.assertEqual(list(order.sets.values_list('product', 'quantity')), [(self.products[0].pk, 2)])
+
+    def test_products_are_validated_in_constant_queries(self):
+        self.post_order([{'product': self.products[0].pk, 'quantity': 1}])
+        with CaptureQueriesContext(connection) as small_order_queries:
+            self.post_order([{'product': self.products[0].pk, 'quantity': 1}])
+        with CaptureQueriesContext(connection) as big_order_queries:
+            self.post_order([{'product': product.pk, 'quantity': 1} for product in self.products * 10])
+        self.assertEqual(len(big_order_queries), len(small_order_queries))
+
+    def test_unknown_and_unavailable_products_are_rejected(self):
+        unavailable_product = Product.objects.create(name='Салат', price=50, image='salad.jpg')
+        response = self.post_order([
+            {'product': self.products[0].pk, 'quantity': 1},
+            {'product': unavailable_product.pk, 'quantity': 1},
+            {'product': 9999, 'quantity': 1},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'products': [
+            {},
+            {'product': [f'Недопустимый первичный ключ "{unavailable_product.pk}" - объект не существует.']},
+            {'product': ['Недопустимый первичный ключ "9999" - объект не существует.']},
+        ]})
+
+    def test_retries_with_same_idempotency_key_create_one_order(self):
+        products = [{'product': self.products[0].pk, 'quantity': 1}]
+        first_response = self.post_order(products, HTTP_IDEMPOTENCY_KEY='retry-me')
+        with self.assertNumQueries(3):
+            retry_response = self.post_order(products, HTTP_IDEMPOTENCY_KEY='retry-me')
+
+        self.assertEqual(retry_response.status_code, 201)
+        self.assertEqual(retry_response.json(), first_response.json())
+        self.assertEqual(Order.objects.count(), 1)
+
+        self.post_order(products, HTTP_IDEMPOTENCY_KEY='another-order')
+        self.assertEqual(Order.objects.count(), 2)
+
+
+class RegisterOrdersBatchTest(OrdersTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_valid_orders_are_created_and_invalid_reported(self):
+        order_data = {
+            'firstname': 'Иван',
+            'lastname': 'Иванов',
+            'phonenumber': '+79001234567',
+            'address': 'Москва, заказ 1',
+            'products': [{'product': self.products[0].pk, 'quantity': 2}],
+        }
+        response = self.client.post('/api/orders/batch/', [
+            order_data,
+            {**order_data, 'products': []},
+            {**order_data, 'address': 'Москва, заказ 2'},
+        ], content_type='application/json')
+
+        self.assertEqual(response.status_code, 201)
+        results = response.json()
+        self.assertEqual([result['status'] for result in results], ['created', 'invalid', 'created'])
+        self.assertIn('products', results[1]['errors'])
+        self.assertEqual(
+            sorted(Order.objects.values_list('address', flat=True)),
+            ['Москва, заказ 1', 'Москва, заказ 2'],
+        )
+        self.assertEqual(ProductSet.objects.filter(order=results[2]['id']).get().quantity, 2)
+        self.assertEqual(OrderCandidate.objects.filter(order=results[0]['id']).count(), 3)
+
+
+class RegisterOrderAsyncTest(TransactionTestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name='Бургер', price=100, image='burger.jpg')
+        restaurant = Restaurant.objects.create(name='Star Burger', address='Москва', contact_phone='+79001234567')
+        RestaurantMenuItem.objects.create(restaurant=restaurant, product=self.product)
+        cache.clear()
+
+    async def test_order_is_registered(self):
+        response = await self.async_client.post('/api/order/async/', {
+            'firstname': 'Иван',
+            'lastname': 'Иванов',
+            'phonenumber': '+79001234567',
+            'address': 'Москва, заказ 1',
+            'products': [{'product': self.product.pk, 'quantity': 2}],
+        }, content_type='application/json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['address'], 'Москва, заказ 1')
+        quantity = await sync_to_async(lambda: Order.objects.get().sets.get().quantity)()
+        self.assertEqual(quantity, 2)
+
+        response = await self.async_client.post('/api/order/async/', {
+            'firstname': 'Иван',
+            'products': [],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('products', response.json())
+
+
+class OrderTotalPriceTest(OrdersTestCase):
+    def test_total_price_follows_product_sets(self):
+        self.create_orders(2)
+        order = Order.objects.order_by('pk').last()
+        self.assertEqual(order.total_price, 200)
+
+        product_set = order.sets.first()
+        product_set.quantity = 3
+        product_set.save()
+        order.refresh_from_db()
+        self.assertEqual(order.total_price, 400)
+
+    def test_check_command_fixes_drift(self):
+        self.create_orders(1)
+        Order.objects.update(total_price=1)
+
+        output = StringIO()
+        call_command('check_order_totals', '--fix', stdout=output)
+
+        self.assertIn('сохранено 1.00, по позициям 100', output.getvalue())
+        self.assertEqual(Order.objects.get().total_price, 100)
+
+
+class ArchiveOrdersTest(OrdersTestCase):
+    def test_old_completed_orders_are_moved_to_archive(self):
+        self.create_orders(3)
+        old_order, fresh_order, open_order = Order.objects.order_by('pk')
+        Order.objects.filter(pk__in=[old_order.pk, open_order.pk]).update(
+            created_at=timezone.now() - timedelta(days=100),
+        )
+        Order.objects.filter(pk__in=[old_order.pk, fresh_order.pk]).update(status='Completed')
+
+        output = StringIO()
+        call_command('archive_orders', '--days', '90', '--batch-size', '1', stdout=output)
+
+        self.assertIn('Перенесено в архив заказов: 1', output.getvalue())
+        self.assertFalse(Order.objects.filter(pk=old_order.pk).exists())
+        self.assertFalse(OrderCandidate.objects.filter(order=old_order.pk).exists())
+        archived_order = ArchivedOrder.objects.get()
+        self.assertEqual(archived_order.pk, old_order.pk)
+        self.assertEqual(archived_order.total_price, old_order.total_price)
+        self.assertEqual(ArchivedProductSet.objects.filter(order=archived_order).count(), 1)
+
+        self.assertEqual(find_order(old_order.pk), archived_order)
+        self.assertEqual(find_order(fresh_order.pk), fresh_order)
+        self.assertEqual(len(get_all_orders_values('id')), 3)
+
+
+@override_settings(ORDER_EVENTS_SETTLE_SECONDS=0)
+class OrderEventsApiTest(OrdersTestCase):
+    def setUp(self):
+        manager = User.objects.create_user('manager', password='password', is_staff=True)
+        self.client.force_login(manager)
+
+    def test_only_changes_since_cursor_are_sent(self):
+        self.create_orders(1)
+        snapshot = self.client.get('/api/orders/queue/').json()
+        self.assertEqual([order['id'] for order in snapshot['orders']], [Order.objects.get().pk])
+
+        order = Order.objects.get()
+        order.status = 'Assembling'
+        order.performer = Restaurant.objects.first()
+        order.save()
+        self.create_orders(1)
+        new_order = Order.objects.latest('pk')
+
+        response = self.client.get('/api/orders/events/', {'since': snapshot['cursor']})
+
+        events = response.json()['events']
+        self.assertEqual(
+            [(event['order_id'], event['kind']) for event in events],
+            [
+                (order.pk, OrderEvent.STATUS_CHANGED),
+                (order.pk, OrderEvent.PERFORMER_ASSIGNED),
+                (new_order.pk, OrderEvent.CREATED),
+            ],
+        )
+        self.assertEqual(events[2]['order']['address'], new_order.address)
+
+        response = self.client.get('/api/orders/events/', {'since': response.json()['cursor']})
+        self.assertEqual(response.json()['events'], [])
+
+    @override_settings(ORDER_EVENTS_SETTLE_SECONDS=5)
+    def test_cursor_does_not_pass_unsettled_events(self):
+        self.create_orders(2)
+        first_event, second_event = OrderEvent.objects.order_by('id')
+        OrderEvent.objects.filter(pk=first_event.pk).update(created_at=timezone.now() - timedelta(seconds=10))
+
+        self.assertEqual(self.client.get('/api/orders/queue/').json()['cursor'], first_event.pk)
+        response = self.client.get('/api/orders/events/', {'since': 0}).json()
+        self.assertEqual([event['id'] for event in response['events']], [first_event.pk])
+        self.assertEqual(response['cursor'], first_event.pk)
+
+        OrderEvent.objects.filter(pk=second_event.pk).update(created_at=timezone.now() - timedelta(seconds=10))
+        response = self.client.get('/api/orders/events/', {'since': response['cursor']}).json()
+        self.assertEqual([event['id'] for event in response['events']], [second_event.pk])
+
+    def test_api_is_for_managers_only(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/api/orders/events/').status_code, 403)
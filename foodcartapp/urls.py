@@ -1,6 +1,14 @@
 from django.urls import path
 
-from .views import product_list_api, banners_list_api, register_order
+from .views import (
+    banners_list_api,
+    order_events_api,
+    order_queue_api,
+    product_list_api,
+    register_order,
+    register_order_async,
+    register_orders_batch,
+)
 
 
 app_name = "foodcartapp"
@@ -9,4 +17,8 @@ urlpatterns = [
     path('products/', product_list_api),
     path('banners/', banners_list_api),
     path('order/', register_order),
+    path('order/async/', register_order_async),
+    path('orders/batch/', register_orders_batch),
+    path('orders/queue/', order_queue_api),
+    path('orders/events/', order_events_api),
 ]
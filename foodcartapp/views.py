@@ -1,44 +1,48 @@
+from itertools import takewhile
+
+import orjson
+from asgiref.sync import sync_to_async
+
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
-from django.db import transaction
-from django.http import JsonResponse
-from django.templatetags.static import static
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.http import HttpResponseNotAllowed
+from django.views.decorators.http import condition
 
 from phonenumber_field.validators import validate_international_phonenumber
 
-from rest_framework import status
-from rest_framework.decorators import api_view
+from rest_framework import exceptions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 
-from places.utils import save_place
-from .models import Product, Order, ProductSet
-from .serializers import OrderSerializer
+from places.utils import enqueue_place, enqueue_places
+from .banners import get_banners_etag, get_banners_last_modified, get_shown_banners
+from .catalog import get_cached_catalog, get_catalog_etag, get_catalog_last_modified
+from .models import IdempotencyKey, Product, Order, OrderEvent, ProductSet, get_events_settled_at
+from .renderers import (
+    FastJsonResponse,
+    PrecompressedJsonResponse,
+    choose_content_encoding,
+    dumps,
+    precompress,
+    wants_pretty_json,
+)
+from .serializers import OrderEventSerializer, OrderSerializer, QueueOrderSerializer, get_total_price
 
 
+@condition(etag_func=get_banners_etag, last_modified_func=get_banners_last_modified)
 def banners_list_api(request):
-    # FIXME move data to db?
-    return JsonResponse([
-        {
-            'title': 'Burger',
-            'src': static('burger.jpg'),
-            'text': 'Tasty Burger at your door step',
-        },
-        {
-            'title': 'Spices',
-            'src': static('food.jpg'),
-            'text': 'All Cuisines',
-        },
+    return FastJsonResponse([
         {
-            'title': 'New York',
-            'src': static('tasty.jpg'),
-            'text': 'Food is incomplete without a tasty dessert',
-        }
-    ], safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+            'title': banner.title,
+            'src': banner.image.url,
+            'text': banner.text,
+        } for banner in get_shown_banners()
+    ], pretty=wants_pretty_json(request))
 
 
-def product_list_api(request):
+def serialize_products():
     products = Product.objects.select_related('category').available()
 
     dumped_products = []
@@ -60,32 +64,209 @@ def product_list_api(request):
             }
         }
         dumped_products.append(dumped_product)
-    return JsonResponse(dumped_products, safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    return dumped_products
+
+
+@condition(etag_func=get_catalog_etag, last_modified_func=get_catalog_last_modified)
+def product_list_api(request):
+    variants, is_hit = get_cached_catalog(lambda: precompress(dumps(serialize_products())))
+    if wants_pretty_json(request):
+        response = FastJsonResponse(orjson.loads(variants['identity']), pretty=True)
+    else:
+        response = PrecompressedJsonResponse(variants, choose_content_encoding(request))
+    response['X-Cache'] = 'HIT' if is_hit else 'MISS'
+    return response
+
+
+def claim_idempotency_key(key):
+    """Save the key for this request or return the key of an earlier request with the same key.
+
+    A concurrent request with the same key waits here until the first one
+    commits or rolls back.
+    """
+    earlier_request = IdempotencyKey.objects.fresh().filter(key=key).first()
+    if earlier_request:
+        return earlier_request
+
+    IdempotencyKey.objects.filter(key=key).delete()
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(key=key)
+    except IntegrityError:
+        return IdempotencyKey.objects.get(key=key)
+    return None
 
 
-@api_view(['POST'])
 @transaction.atomic
-def register_order(request):
-    serializer = OrderSerializer(data=request.data)
+def save_order(order_data, idempotency_key=None):
+    """Register an order from API data. Return `(response body, status code)`.
+
+    Raises `rest_framework.exceptions.ValidationError` for invalid data.
+    """
+    if idempotency_key:
+        earlier_request = claim_idempotency_key(idempotency_key)
+        if earlier_request:
+            return earlier_request.response_body, earlier_request.response_status
+
+    serializer = OrderSerializer(data=order_data)
     serializer.is_valid(raise_exception=True)
-    order = Order.objects.create(
-        firstname=serializer.validated_data['firstname'],
-        lastname=serializer.validated_data['lastname'],
-        phonenumber=serializer.validated_data['phonenumber'],
-        address=serializer.validated_data['address'],
-
-    )
-    save_place(order.address)
-    order_products_fields = serializer.validated_data['products']
-    products = [ProductSet(
-        order=order,
-        product=fields['product'],
-        quantity=fields['quantity'],
-        price=fields['product'].price,
-    ) for fields in order_products_fields]
-
-    ProductSet.objects.bulk_create(products)
-    return Response(serializer.data, status=201)
+    order = serializer.save()
+    enqueue_place(order.address)
+    Order.objects.filter(pk=order.pk).refresh_candidates()
+
+    if idempotency_key:
+        IdempotencyKey.objects.filter(key=idempotency_key).update(
+            response_status=201,
+            response_body=serializer.data,
+        )
+    return serializer.data, 201
+
+
+@api_view(['POST'])
+def register_order(request):
+    response_body, response_status = save_order(request.data, request.headers.get('Idempotency-Key'))
+    return Response(response_body, status=response_status)
+
+
+def save_order_in_worker_thread(order_data, idempotency_key):
+    # Worker threads don't get request_finished, so close the connection here
+    try:
+        return save_order(order_data, idempotency_key)
+    finally:
+        close_old_connections()
+
+
+async def register_order_async(request):
+    """Async twin of `register_order` for the ASGI server.
+
+    The ORM is synchronous, so the database work runs in a thread pool while
+    the event loop keeps accepting requests.
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        order_data = orjson.loads(request.body)
+    except orjson.JSONDecodeError:
+        return FastJsonResponse({'detail': 'JSON parse error'}, status=400)
+
+    save = sync_to_async(save_order_in_worker_thread, thread_sensitive=False)
+    try:
+        response_body, response_status = await save(order_data, request.headers.get('Idempotency-Key'))
+    except exceptions.ValidationError as e:
+        response_body, response_status = e.detail, 400
+    return FastJsonResponse(response_body, status=response_status)
+
+
+# csrf_exempt can't wrap coroutines in this Django version, so mark the view directly
+register_order_async.csrf_exempt = True
+
+
+def create_orders(orders):
+    """Insert orders with as few queries as the database allows and return them with pks."""
+    if connection.features.can_return_rows_from_bulk_insert:
+        orders = Order.objects.bulk_create(orders)
+        # bulk_create sends no post_save, so log the events here
+        OrderEvent.objects.bulk_create([OrderEvent.for_order(order, OrderEvent.CREATED) for order in orders])
+        return orders
+    for order in orders:
+        order.save()
+    return orders
+
+
+@api_view(['POST'])
+@transaction.atomic
+def register_orders_batch(request):
+    if not isinstance(request.data, list):
+        return Response({'non_field_errors': ['Ожидается список заказов.']}, status=400)
+    if len(request.data) > settings.ORDERS_BATCH_MAX_SIZE:
+        return Response(
+            {'non_field_errors': [f'Не больше {settings.ORDERS_BATCH_MAX_SIZE} заказов за раз.']},
+            status=400,
+        )
+
+    results = []
+    valid_serializers = []
+    for order_data in request.data:
+        serializer = OrderSerializer(data=order_data)
+        if serializer.is_valid():
+            valid_serializers.append(serializer)
+            results.append(None)
+        else:
+            results.append({'status': 'invalid', 'errors': serializer.errors})
+
+    orders = create_orders([
+        Order(
+            firstname=serializer.validated_data['firstname'],
+            lastname=serializer.validated_data['lastname'],
+            phonenumber=serializer.validated_data['phonenumber'],
+            address=serializer.validated_data['address'],
+            total_price=get_total_price(serializer.validated_data['products']),
+        ) for serializer in valid_serializers
+    ])
+    ProductSet.objects.bulk_create([
+        ProductSet(
+            order=order,
+            product_id=fields['product'],
+            quantity=fields['quantity'],
+            price=fields['price'],
+        )
+        for order, serializer in zip(orders, valid_serializers)
+        for fields in serializer.validated_data['products']
+    ])
+    enqueue_places(order.address for order in orders)
+    Order.objects.filter(pk__in=[order.pk for order in orders]).refresh_candidates()
+
+    created_orders = iter(zip(orders, valid_serializers))
+    for index, result in enumerate(results):
+        if result is None:
+            order, serializer = next(created_orders)
+            results[index] = {'status': 'created', 'id': order.pk, 'order': serializer.data}
+    return Response(results, status=201 if orders else 400)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def order_queue_api(request):
+    """Snapshot of the manager queue and the event cursor to poll `order_events_api` from."""
+    # Take the cursor first: later events are sent again rather than lost
+    cursor = OrderEvent.objects.get_settled_cursor()
+    orders = Order.objects.queue().select_related('performer').with_candidates()
+    return Response({
+        'cursor': cursor,
+        'orders': QueueOrderSerializer(orders, many=True).data,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def order_events_api(request):
+    """Settled order events after the `since` cursor. New orders come with their queue data.
+
+    The cursor never moves past an event that is not settled yet, so events
+    of transactions still in flight are not skipped.
+    """
+    try:
+        since = int(request.query_params.get('since', 0))
+    except ValueError:
+        return Response({'since': ['Ожидается номер события.']}, status=400)
+
+    limit = settings.ORDER_EVENTS_PAGE_SIZE
+    settled_at = get_events_settled_at()
+    events = OrderEvent.objects.filter(id__gt=since).order_by('id')[:limit + 1]
+    events = list(takewhile(lambda event: event.created_at < settled_at, events))
+    has_more = len(events) > limit
+    events = events[:limit]
+
+    created_order_ids = [event.order_id for event in events if event.kind == OrderEvent.CREATED]
+    if created_order_ids:
+        orders = Order.objects.filter(pk__in=created_order_ids).select_related('performer').with_candidates()
+        orders_by_id = {order.pk: order for order in orders}
+        for event in events:
+            if event.kind == OrderEvent.CREATED:
+                event.order = orders_by_id.get(event.order_id)
+
+    return Response({
+        'cursor': events[-1].id if events else since,
+        'has_more': has_more,
+        'events': OrderEventSerializer(events, many=True).data,
+    })
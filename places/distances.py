@@ -0,0 +1,61 @@
+import numpy as np
+from django.conf import settings
+from geopy import distance
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_matrix(origins, destinations):
+    """Return great-circle distances in km between every pair of points.
+
+    `origins` and `destinations` are sequences of `(lat, lon)`; the result has
+    one row per origin. Unknown coordinates give `nan`.
+    """
+    origins = np.radians(np.array(origins, dtype=float).reshape(-1, 2))
+    destinations = np.radians(np.array(destinations, dtype=float).reshape(-1, 2))
+
+    lat1, lon1 = origins[:, 0, np.newaxis], origins[:, 1, np.newaxis]
+    lat2, lon2 = destinations[np.newaxis, :, 0], destinations[np.newaxis, :, 1]
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def geodesic_matrix(origins, destinations):
+    matrix = np.full((len(origins), len(destinations)), np.nan)
+    for row, origin in enumerate(origins):
+        for column, destination in enumerate(destinations):
+            if None in origin or None in destination:
+                continue
+            matrix[row, column] = distance.distance(origin, destination).km
+    return matrix
+
+
+def distance_matrix(origins, destinations, geodesic_limit=None):
+    """Distances in km between all origins and destinations.
+
+    Batches with at most `geodesic_limit` pairs (`GEODESIC_DISTANCE_LIMIT` by
+    default) use the exact geodesic, bigger ones the vectorized haversine.
+    """
+    if geodesic_limit is None:
+        geodesic_limit = settings.GEODESIC_DISTANCE_LIMIT
+    if len(origins) * len(destinations) <= geodesic_limit:
+        return geodesic_matrix(origins, destinations)
+    return haversine_matrix(origins, destinations)
+
+
+def sort_by_distance(row, indexes=None):
+    """Return `[(index, km), ...]` for `indexes` of a matrix row, nearest first.
+
+    All indexes are used by default. Unknown distances go last with `None`
+    instead of km.
+    """
+    if indexes is None:
+        indexes = range(len(row))
+    indexes = np.array(list(indexes), dtype=int)
+    return [
+        (int(index), None if np.isnan(row[index]) else float(row[index]))
+        for index in indexes[np.argsort(row[indexes], kind='stable')]
+    ]
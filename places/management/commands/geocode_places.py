@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from places.utils import geocode_place_requests
+
+
+class Command(BaseCommand):
+    help = 'Геокодирует адреса из очереди и сохраняет их координаты'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Сколько адресов брать из очереди за раз')
+        parser.add_argument('--sleep', type=float, default=1, help='Пауза в секундах, когда очередь пуста')
+        parser.add_argument('--once', action='store_true', help='Разобрать очередь и завершиться')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = geocode_place_requests(options['batch_size'])
+            if processed:
+                self.stdout.write(f'Геокодировано адресов: {processed}')
+                continue
+            if options['once']:
+                return
+            time.sleep(options['sleep'])
@@ -0,0 +1,30 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from places.models import Place
+from places.normalization import normalize_address
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает нормализованные адреса мест и объединяет дубликаты'
+
+    def handle(self, *args, **options):
+        places = list(Place.objects.order_by('-request_date'))
+        places_by_key = defaultdict(list)
+        for place in places:
+            place.normalized_address = normalize_address(place.address)
+            places_by_key[place.normalized_address].append(place)
+
+        duplicate_ids = set()
+        for same_places in places_by_key.values():
+            # Keep the most recent place with coordinates, if there is any.
+            same_places.sort(key=lambda place: place.latitude is None)
+            duplicate_ids.update(place.pk for place in same_places[1:])
+
+        places = [place for place in places if place.pk not in duplicate_ids]
+        with transaction.atomic():
+            Place.objects.filter(pk__in=duplicate_ids).delete()
+            Place.objects.bulk_update(places, ['normalized_address'], batch_size=500)
+        self.stdout.write(f'Удалено дубликатов: {len(duplicate_ids)}')
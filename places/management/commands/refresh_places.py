@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from places.models import Place
+from places.utils import save_places
+
+
+class Command(BaseCommand):
+    help = 'Обновляет координаты мест, у которых истёк срок хранения в кэше'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Сколько адресов обновлять за раз')
+
+    def handle(self, *args, **options):
+        refreshed = 0
+        while True:
+            addresses = list(
+                Place.objects.stale()
+                .order_by('request_date')
+                .values_list('address', flat=True)[:options['batch_size']]
+            )
+            if not addresses:
+                break
+            geocoded = save_places(addresses, force=True)
+            if not geocoded:
+                # The geocoder is failing: keep the stale coordinates and try later
+                break
+            refreshed += geocoded
+        self.stdout.write(f'Обновлено мест: {refreshed}')
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:08
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0002_placerequest'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='place',
+            name='request_date',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='дата запроса координат'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations, models
+
+from places.normalization import normalize_address
+
+
+def fill_normalized_addresses(apps, schema_editor):
+    Place = apps.get_model('places', 'Place')
+    PlaceRequest = apps.get_model('places', 'PlaceRequest')
+
+    places = list(Place.objects.all())
+    for place in places:
+        place.normalized_address = normalize_address(place.address)
+    Place.objects.bulk_update(places, ['normalized_address'], batch_size=500)
+
+    known_keys = set()
+    for place_request in PlaceRequest.objects.order_by('created_at'):
+        key = normalize_address(place_request.address)
+        if key in known_keys:
+            place_request.delete()
+            continue
+        known_keys.add(key)
+        place_request.normalized_address = key
+        place_request.save(update_fields=['normalized_address'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0003_place_cache_expiration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='normalized_address',
+            field=models.CharField(blank=True, db_index=True, max_length=255, verbose_name='нормализованный адрес'),
+        ),
+        migrations.AddField(
+            model_name='placerequest',
+            name='normalized_address',
+            field=models.CharField(default='', max_length=255, verbose_name='нормализованный адрес'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_normalized_addresses, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='placerequest',
+            name='normalized_address',
+            field=models.CharField(max_length=255, unique=True, verbose_name='нормализованный адрес'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations, models
+
+
+def delete_duplicate_places(apps, schema_editor):
+    Place = apps.get_model('places', 'Place')
+
+    kept_places = {}
+    duplicate_ids = []
+    for place in Place.objects.order_by('-request_date').only('id', 'normalized_address', 'latitude'):
+        kept_place = kept_places.get(place.normalized_address)
+        if kept_place is None:
+            kept_places[place.normalized_address] = place
+            continue
+        if kept_place.latitude is None and place.latitude is not None:
+            kept_places[place.normalized_address] = place
+            place = kept_place
+        duplicate_ids.append(place.pk)
+    Place.objects.filter(pk__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0004_normalized_address'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_places, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='place',
+            name='normalized_address',
+            field=models.CharField(blank=True, max_length=255, unique=True, verbose_name='нормализованный адрес'),
+        ),
+    ]
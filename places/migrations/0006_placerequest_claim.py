@@ -0,0 +1,23 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0005_unique_normalized_address'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='placerequest',
+            name='claim_token',
+            field=models.UUIDField(blank=True, db_index=True, null=True, verbose_name='метка геокодера'),
+        ),
+        migrations.AddField(
+            model_name='placerequest',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='занят геокодером до'),
+        ),
+    ]
@@ -1,6 +1,36 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
 
+from places.normalization import normalize_address
+
+
+def get_expiration_dates():
+    now = timezone.now()
+    return (
+        now - timedelta(days=settings.PLACE_CACHE_TTL_DAYS),
+        now - timedelta(hours=settings.PLACE_NEGATIVE_CACHE_TTL_HOURS),
+    )
+
+
+class PlaceQuerySet(models.QuerySet):
+    def fresh(self):
+        found_expired_at, not_found_expired_at = get_expiration_dates()
+        return self.filter(
+            Q(latitude__isnull=False, request_date__gte=found_expired_at)
+            | Q(latitude__isnull=True, request_date__gte=not_found_expired_at)
+        )
+
+    def stale(self):
+        found_expired_at, not_found_expired_at = get_expiration_dates()
+        return self.filter(
+            Q(latitude__isnull=False, request_date__lt=found_expired_at)
+            | Q(latitude__isnull=True, request_date__lt=not_found_expired_at)
+        )
+
 
 class Place(models.Model):
     address = models.CharField(
@@ -9,6 +39,12 @@ class Place(models.Model):
         unique=True,
         blank=True,
     )
+    normalized_address = models.CharField(
+        'нормализованный адрес',
+        max_length=255,
+        unique=True,
+        blank=True,
+    )
     latitude = models.FloatField(
         'широта',
         blank=True,
@@ -20,11 +56,14 @@ class Place(models.Model):
         blank=True,
         null=True
     )
-    request_date = models.DateField(
+    request_date = models.DateTimeField(
         'дата запроса координат',
         default=timezone.now,
+        db_index=True,
     )
 
+    objects = PlaceQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Место'
         verbose_name_plural = 'Места'
@@ -32,3 +71,55 @@ class Place(models.Model):
     def __str__(self):
         return self.address
 
+    def save(self, *args, **kwargs):
+        self.normalized_address = normalize_address(self.address)
+        super().save(*args, **kwargs)
+
+    def is_fresh(self):
+        found_expired_at, not_found_expired_at = get_expiration_dates()
+        if self.latitude is None:
+            return self.request_date >= not_found_expired_at
+        return self.request_date >= found_expired_at
+
+
+class PlaceRequestQuerySet(models.QuerySet):
+    def unclaimed(self):
+        return self.filter(Q(claimed_until__isnull=True) | Q(claimed_until__lt=timezone.now()))
+
+
+class PlaceRequest(models.Model):
+    address = models.CharField(
+        'адрес',
+        max_length=255,
+        unique=True,
+    )
+    normalized_address = models.CharField(
+        'нормализованный адрес',
+        max_length=255,
+        unique=True,
+    )
+    created_at = models.DateTimeField(
+        'дата постановки в очередь',
+        default=timezone.now,
+        db_index=True,
+    )
+    claimed_until = models.DateTimeField(
+        'занят геокодером до',
+        blank=True,
+        null=True,
+    )
+    claim_token = models.UUIDField(
+        'метка геокодера',
+        blank=True,
+        null=True,
+        db_index=True,
+    )
+
+    objects = PlaceRequestQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Адрес в очереди на геокодирование'
+        verbose_name_plural = 'Адреса в очереди на геокодирование'
+
+    def __str__(self):
+        return self.address
@@ -0,0 +1,35 @@
+import re
+
+ABBREVIATIONS = {
+    'б-р': 'бульвар',
+    'бул': 'бульвар',
+    'г': 'город',
+    'д': 'дом',
+    'к': 'корпус',
+    'корп': 'корпус',
+    'кв': 'квартира',
+    'наб': 'набережная',
+    'обл': 'область',
+    'пер': 'переулок',
+    'пл': 'площадь',
+    'пос': 'поселок',
+    'пр': 'проспект',
+    'пр-д': 'проезд',
+    'пр-т': 'проспект',
+    'просп': 'проспект',
+    'стр': 'строение',
+    'ул': 'улица',
+    'ш': 'шоссе',
+}
+
+TOKEN_PATTERN = re.compile(r'\w+(?:-\w+)*')
+
+
+def normalize_address(address):
+    """Return the canonical cache key of an address.
+
+    Case, `ё`, punctuation, spacing and common abbreviations don't matter:
+    `Москва, ул. Тверская, д.1` and `москва улица тверская дом 1` give the same key.
+    """
+    tokens = TOKEN_PATTERN.findall(address.lower().replace('ё', 'е'))
+    return ' '.join(ABBREVIATIONS.get(token, token) for token in tokens)
@@ -0,0 +1,4 @@
+from django.dispatch import Signal
+
+# Sent by `save_places` with normalized `addresses` that got new coordinates
+places_geocoded = Signal()
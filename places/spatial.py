@@ -0,0 +1,39 @@
+import math
+from collections import defaultdict
+
+KM_PER_LATITUDE_DEGREE = 111.2
+
+
+class GridIndex:
+    """Spatial index bucketing points into a grid of `cell_km` cells.
+
+    Radius queries only look at cells around the query point, so points in
+    other cities are never compared with it.
+    """
+
+    def __init__(self, points, cell_km=10):
+        """`points` is a mapping `{key: (lat, lon)}`."""
+        self.cell_degrees = cell_km / KM_PER_LATITUDE_DEGREE
+        self.cells = defaultdict(list)
+        for key, (lat, lon) in points.items():
+            self.cells[self.get_cell(lat, lon)].append(key)
+
+    def get_cell(self, lat, lon):
+        return math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees)
+
+    def nearby(self, lat, lon, radius_km):
+        """Return keys of points in cells that may be within `radius_km`.
+
+        The result is a superset: check exact distances before use.
+        """
+        lat_span = radius_km / KM_PER_LATITUDE_DEGREE
+        farthest_lat = min(abs(lat) + lat_span, 89.9)
+        lon_span = lat_span / math.cos(math.radians(farthest_lat))
+
+        min_row, min_column = self.get_cell(lat - lat_span, lon - lon_span)
+        max_row, max_column = self.get_cell(lat + lat_span, lon + lon_span)
+        keys = []
+        for row in range(min_row, max_row + 1):
+            for column in range(min_column, max_column + 1):
+                keys += self.cells.get((row, column), [])
+        return keys
@@ -1,3 +1,188 @@
-from django.test import TestCase
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from .distances import distance_matrix, haversine_matrix, sort_by_distance
+from .models import Place, PlaceRequest
+from .normalization import normalize_address
+from .singleflight import SingleFlight
+from .spatial import GridIndex
+from star_burger.custom_errors import YandexApiError
+from .utils import geocode_place_requests, get_places, save_places
+
+MOSCOW = (55.7539, 37.6208)
+SAINT_PETERSBURG = (59.9386, 30.3141)
+KAZAN = (55.7961, 49.1064)
+
+
+class DistanceMatrixTest(SimpleTestCase):
+    def test_haversine_is_close_to_geodesic(self):
+        points = [MOSCOW, SAINT_PETERSBURG, KAZAN]
+        haversine = haversine_matrix(points, points)
+        geodesic = distance_matrix(points, points, geodesic_limit=len(points) ** 2)
+        for haversine_row, geodesic_row in zip(haversine, geodesic):
+            for haversine_km, geodesic_km in zip(haversine_row, geodesic_row):
+                self.assertAlmostEqual(haversine_km, geodesic_km, delta=geodesic_km * 0.005)
+
+    def test_sort_by_distance_puts_unknown_coordinates_last(self):
+        row, = distance_matrix([MOSCOW], [KAZAN, (None, None), SAINT_PETERSBURG, MOSCOW], geodesic_limit=0)
+        candidates = sort_by_distance(row)
+        self.assertEqual([index for index, _ in candidates], [3, 2, 0, 1])
+        self.assertIsNone(candidates[-1][1])
+        self.assertEqual([index for index, _ in sort_by_distance(row, [0, 1, 2])], [2, 0, 1])
+
+
+class PlaceQueueTest(TestCase):
+    def test_unknown_addresses_are_geocoded_by_worker(self):
+        Place.objects.create(address='Москва, Красная площадь', latitude=MOSCOW[0], longitude=MOSCOW[1])
+
+        places = get_places(['Москва, Красная площадь', 'Казань, Кремль'])
+        self.assertEqual(list(places), ['Москва, Красная площадь'])
+        self.assertQuerysetEqual(PlaceRequest.objects.all(), ['Казань, Кремль'], transform=str)
+
+        with patch('places.utils.fetch_coordinates', return_value=(str(KAZAN[1]), str(KAZAN[0]))):
+            self.assertEqual(geocode_place_requests(batch_size=10), 1)
+
+        self.assertFalse(PlaceRequest.objects.exists())
+        self.assertEqual(get_places(['Казань, Кремль']), {'Казань, Кремль': KAZAN})
+
+    def test_save_places_geocodes_each_address_once(self):
+        Place.objects.create(address='Казань, Кремль', request_date=timezone.now() - timedelta(days=1))
+
+        with patch('places.utils.fetch_coordinates', return_value=(str(KAZAN[1]), str(KAZAN[0]))) as fetch:
+            geocoded = save_places(['Казань, Кремль', 'Казань, Кремль', 'Москва, Красная площадь'])
+
+        self.assertEqual(geocoded, 2)
+        self.assertEqual(fetch.call_count, 2)
+        self.assertEqual(
+            get_places(['Казань, Кремль', 'Москва, Красная площадь']),
+            {'Казань, Кремль': KAZAN, 'Москва, Красная площадь': KAZAN},
+        )
+
+    def test_addresses_claimed_by_another_process_are_skipped(self):
+        PlaceRequest.objects.create(
+            address='Казань, Кремль',
+            normalized_address=normalize_address('Казань, Кремль'),
+            claim_token=uuid.uuid4(),
+            claimed_until=timezone.now() + timedelta(minutes=5),
+        )
+
+        with patch('places.utils.fetch_coordinates', return_value=(str(MOSCOW[1]), str(MOSCOW[0]))) as fetch:
+            geocoded = save_places(['Казань, Кремль', 'Москва, Красная площадь'])
+            self.assertEqual(geocode_place_requests(batch_size=10), 0)
+
+        self.assertEqual(geocoded, 1)
+        fetch.assert_called_once()
+        self.assertQuerysetEqual(PlaceRequest.objects.all(), ['Казань, Кремль'], transform=str)
+
+    def test_fresh_entries_skip_geocoder(self):
+        Place.objects.create(address='Москва, Красная площадь', latitude=MOSCOW[0], longitude=MOSCOW[1])
+        Place.objects.create(address='Нигде')
+
+        with patch('places.utils.fetch_coordinates') as fetch:
+            self.assertEqual(save_places(['Москва, Красная площадь', 'Нигде']), 0)
+        fetch.assert_not_called()
+
+    def test_failed_lookups_keep_cached_coordinates(self):
+        request_date = timezone.now() - timedelta(days=60)
+        Place.objects.create(address='Москва, Красная площадь', latitude=MOSCOW[0], longitude=MOSCOW[1],
+                             request_date=request_date)
+        PlaceRequest.objects.create(address='Казань, Кремль', normalized_address=normalize_address('Казань, Кремль'))
+
+        with patch('places.utils.fetch_coordinates', side_effect=YandexApiError('Yandex is down')), \
+                self.assertLogs('places.utils', 'WARNING'):
+            call_command('refresh_places', stdout=StringIO())
+            self.assertEqual(geocode_place_requests(batch_size=10), 0)
+
+        place = Place.objects.get()
+        self.assertEqual((place.latitude, place.longitude), MOSCOW)
+        self.assertEqual(place.request_date, request_date)
+        self.assertQuerysetEqual(
+            PlaceRequest.objects.order_by('address'),
+            ['Казань, Кремль', 'Москва, Красная площадь'],
+            transform=str,
+        )
+
+    def test_failed_lookups_are_not_retried_before_backoff(self):
+        get_places(['Казань, Кремль', 'Нигде'])
+
+        with patch('places.utils.fetch_coordinates', side_effect=YandexApiError('Quota exceeded')) as fetch, \
+                self.assertLogs('places.utils', 'WARNING'):
+            geocode_place_requests(batch_size=10)
+            self.assertEqual(fetch.call_count, 2)
+            geocode_place_requests(batch_size=10)
+            self.assertEqual(fetch.call_count, 2)
+
+        PlaceRequest.objects.update(claimed_until=timezone.now() - timedelta(seconds=1))
+        with patch('places.utils.fetch_coordinates', return_value=(str(KAZAN[1]), str(KAZAN[0]))):
+            self.assertEqual(geocode_place_requests(batch_size=10), 2)
+        self.assertFalse(PlaceRequest.objects.exists())
+
+    def test_not_found_entries_expire_sooner(self):
+        request_date = timezone.now() - timedelta(days=2)
+        Place.objects.create(address='Москва, Красная площадь', latitude=MOSCOW[0], longitude=MOSCOW[1],
+                             request_date=request_date)
+        Place.objects.create(address='Нигде', request_date=request_date)
+
+        self.assertQuerysetEqual(Place.objects.stale(), ['Нигде'], transform=str)
+        get_places(['Москва, Красная площадь', 'Нигде'])
+        self.assertQuerysetEqual(PlaceRequest.objects.all(), ['Нигде'], transform=str)
+
+    def test_address_variants_share_cache_entry(self):
+        Place.objects.create(address='Москва, ул. Тверская, д. 1', latitude=MOSCOW[0], longitude=MOSCOW[1])
+
+        self.assertEqual(
+            get_places(['москва ,улица тверская, дом 1']),
+            {'москва ,улица тверская, дом 1': MOSCOW},
+        )
+        self.assertFalse(PlaceRequest.objects.exists())
+
+
+class NormalizeAddressTest(SimpleTestCase):
+    def test_punctuation_case_and_abbreviations_are_ignored(self):
+        self.assertEqual(normalize_address('Москва, Тверская 1'), normalize_address('москва ,тверская, 1'))
+        self.assertEqual(normalize_address('Ленинский пр-т, д.5'), 'ленинский проспект дом 5')
+        self.assertEqual(normalize_address('  Щёлковское   ш. '), 'щелковское шоссе')
+
+
+class SingleFlightTest(SimpleTestCase):
+    def test_concurrent_calls_with_same_key_share_result(self):
+        flight = SingleFlight()
+        all_started = threading.Barrier(4)
+        calls = []
+
+        def geocode():
+            calls.append(1)
+            time.sleep(0.2)
+            return KAZAN
+
+        def call():
+            all_started.wait(timeout=5)
+            return flight.do('казань кремль', geocode)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(call) for _ in range(4)]
+            results = [future.result() for future in futures]
+
+        self.assertEqual(results, [KAZAN] * 4)
+        self.assertEqual(len(calls), 1)
+
+
+class GridIndexTest(SimpleTestCase):
+    def test_nearby_skips_other_cities(self):
+        grid = GridIndex({
+            'moscow': MOSCOW,
+            'moscow_suburb': (55.9, 37.8),
+            'kazan': KAZAN,
+            'saint_petersburg': SAINT_PETERSBURG,
+        })
+        self.assertCountEqual(grid.nearby(*MOSCOW, radius_km=30), ['moscow', 'moscow_suburb'])
+        self.assertEqual(grid.nearby(*KAZAN, radius_km=30), ['kazan'])
@@ -1,15 +1,31 @@
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
 import requests
+from requests.adapters import HTTPAdapter
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 
-from places.models import Place
+from places.models import Place, PlaceRequest
+from places.normalization import normalize_address
+from places.signals import places_geocoded
+from places.singleflight import SingleFlight
 from star_burger.custom_errors import YandexApiError
 
+logger = logging.getLogger(__name__)
+
+geocoder_flight = SingleFlight()
+
+FAILED = object()
 
-def fetch_coordinates(apikey, address):
+
+def fetch_coordinates(apikey, address, session=requests):
     base_url = "https://geocode-maps.yandex.ru/1.x"
     try:
-        response = requests.get(base_url, params={
+        response = session.get(base_url, params={
             "geocode": address,
             "apikey": apikey,
             "format": "json",
@@ -27,24 +43,197 @@ def fetch_coordinates(apikey, address):
     return lon, lat
 
 
-def save_place(address):
-    place, _ = Place.objects.get_or_create(address=address)
-    try:
-        place_coordinates = fetch_coordinates(
-            settings.YANDEX_API_KEY,
-            address
+def fetch_coordinates_batch(apikey, addresses, max_workers=None):
+    """Geocode addresses concurrently over one pooled HTTP session.
+
+    Return `{address: (lon, lat)}`; addresses that weren't found map to
+    `None`. Failed lookups are left out, so callers keep what they had.
+    """
+    addresses = set(addresses)
+    if not addresses:
+        return {}
+    max_workers = min(max_workers or settings.GEOCODER_MAX_WORKERS, len(addresses))
+
+    def fetch(address):
+        try:
+            coordinates = geocoder_flight.do(
+                normalize_address(address),
+                fetch_coordinates,
+                apikey,
+                address,
+                session=session,
+            )
+            return address, coordinates
+        except YandexApiError as e:
+            logger.warning('Geocoding of %r failed: %s', address, e)
+            return address, FAILED
+
+    with requests.Session() as session:
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        session.mount('https://', adapter)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(fetch, addresses)
+            return {address: coordinates for address, coordinates in results if coordinates is not FAILED}
+
+
+def group_by_key(addresses):
+    """Return `{normalized address: address}`, one address per cache key."""
+    addresses_by_key = {}
+    for address in addresses:
+        addresses_by_key.setdefault(normalize_address(address), address)
+    return addresses_by_key
+
+
+def get_places_by_key(keys):
+    return {
+        place.normalized_address: place
+        for place in Place.objects.filter(normalized_address__in=keys)
+    }
+
+
+def claim_place_requests(addresses_by_key):
+    """Claim queue rows of these addresses for one lookup and return the claim token.
+
+    Rows are created if missing and claimed with a single conditional UPDATE,
+    which locks them on every database backend. Rows claimed by another
+    process stay with it until it releases them or the claim times out.
+    """
+    token = uuid.uuid4()
+    claimed_until = timezone.now() + timedelta(seconds=settings.GEOCODER_CLAIM_TIMEOUT_SECONDS)
+    with transaction.atomic():
+        create_place_requests(addresses_by_key)
+        (
+            PlaceRequest.objects
+            .filter(normalized_address__in=addresses_by_key.keys())
+            .unclaimed()
+            .update(claim_token=token, claimed_until=claimed_until)
+        )
+    return token
+
+
+def save_places(addresses, force=False):
+    """Geocode addresses in one batch and store them in `Place`.
+
+    Addresses are deduplicated by their normalized form and claimed in the
+    geocoding queue for the time of the lookup, so concurrent calls, in this
+    or other processes, never geocode the same address twice. Addresses with
+    fresh cache entries are skipped unless `force` is set. Addresses that
+    weren't found are stored too, as entries without coordinates, so they
+    are not requested again until they expire. Failed lookups leave the
+    stored entries untouched and are retried from the queue after
+    `PLACE_NEGATIVE_CACHE_TTL_HOURS`.
+    Return how many distinct addresses were geocoded.
+    """
+    addresses_by_key = group_by_key(addresses)
+    if not addresses_by_key:
+        return 0
+    token = claim_place_requests(addresses_by_key)
+    claimed_requests = PlaceRequest.objects.filter(claim_token=token)
+    claimed_keys = set(claimed_requests.values_list('normalized_address', flat=True))
+    addresses_by_key = {key: address for key, address in addresses_by_key.items() if key in claimed_keys}
+
+    # Another process may have geocoded these addresses before we claimed them
+    places = get_places_by_key(addresses_by_key.keys())
+    if not force:
+        for key, place in places.items():
+            if place.is_fresh():
+                del addresses_by_key[key]
+
+    # No transaction is open during the HTTP calls: the claim keeps other processes away
+    coordinates = fetch_coordinates_batch(settings.YANDEX_API_KEY, addresses_by_key.values())
+
+    new_places = []
+    updated_places = []
+    failed_keys = set()
+    for key, address in list(addresses_by_key.items()):
+        if address not in coordinates:
+            failed_keys.add(key)
+            del addresses_by_key[key]
+            continue
+        lon, lat = coordinates[address] or (None, None)
+        place = places.get(key)
+        if place is None:
+            new_places.append(Place(address=address, normalized_address=key, latitude=lat, longitude=lon))
+            continue
+        place.latitude, place.longitude = lat, lon
+        place.request_date = timezone.now()
+        updated_places.append(place)
+
+    with transaction.atomic():
+        Place.objects.bulk_create(new_places, ignore_conflicts=True)
+        Place.objects.bulk_update(updated_places, ['latitude', 'longitude', 'request_date'])
+        # Failed lookups keep their claim as a backoff, like negative cache entries,
+        # so an outage or a spent quota isn't hammered by every worker pass
+        claimed_requests.filter(normalized_address__in=failed_keys).update(
+            claim_token=None,
+            claimed_until=timezone.now() + timedelta(hours=settings.PLACE_NEGATIVE_CACHE_TTL_HOURS),
         )
-    except (requests.exceptions.HTTPError, requests.exceptions.RequestException):
-        place.latitude = place.longitude = None
-        place.update_time = timezone.now()
-        place.save()
-        return
-
-    if not place_coordinates:
-        place.latitude = place.longitude = None
-        place.update_time = timezone.now()
-        place.save()
-        return
-
-    place.latitude, place.longitude = place_coordinates
-    place.save()
+        claimed_requests.exclude(normalized_address__in=failed_keys).delete()
+
+    if addresses_by_key:
+        places_geocoded.send(sender=Place, addresses=set(addresses_by_key.keys()))
+    return len(addresses_by_key)
+
+
+def enqueue_places(addresses):
+    """Put addresses without fresh cache entries in the geocoding queue."""
+    addresses_by_key = group_by_key(addresses)
+    known_keys = (
+        Place.objects.fresh()
+        .filter(normalized_address__in=addresses_by_key.keys())
+        .values_list('normalized_address', flat=True)
+    )
+    for key in set(known_keys):
+        del addresses_by_key[key]
+    create_place_requests(addresses_by_key)
+
+
+def enqueue_place(address):
+    enqueue_places([address])
+
+
+def create_place_requests(addresses_by_key):
+    PlaceRequest.objects.bulk_create(
+        [
+            PlaceRequest(address=address, normalized_address=key)
+            for key, address in addresses_by_key.items()
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def get_places(addresses):
+    """Return `{address: (lat, lon)}` for already geocoded addresses.
+
+    Places are looked up by normalized address with one query, the rest are
+    put in the geocoding queue and are missing from the result until
+    `geocode_places` resolves them. Expired entries are still returned but
+    are queued for a refresh.
+    """
+    keys = {address: normalize_address(address) for address in set(addresses)}
+    known_places = get_places_by_key(set(keys.values()))
+
+    places = {}
+    pending_addresses = {}
+    for address, key in keys.items():
+        place = known_places.get(key)
+        if place is not None:
+            places[address] = (place.latitude, place.longitude)
+            if place.is_fresh():
+                continue
+        pending_addresses.setdefault(key, address)
+
+    if pending_addresses:
+        create_place_requests(pending_addresses)
+    return places
+
+
+def geocode_place_requests(batch_size):
+    """Geocode the oldest queued addresses. Return how many were geocoded.
+
+    Addresses claimed by other workers are skipped.
+    """
+    place_requests = list(PlaceRequest.objects.unclaimed().order_by('created_at')[:batch_size])
+    if not place_requests:
+        return 0
+    return save_places(place_request.address for place_request in place_requests)
@@ -1,3 +1,75 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from foodcartapp.models import Order, OrderCandidate, Restaurant
+
+
+@override_settings(MANAGER_ORDERS_PAGE_SIZE=2)
+class ViewOrdersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='password', is_staff=True)
+        cls.restaurant = Restaurant.objects.create(name='Star Burger', address='Москва', contact_phone='+79001234567')
+        cls.orders = [
+            Order.objects.create(
+                firstname='Иван',
+                lastname='Иванов',
+                phonenumber='+79001234567',
+                address=f'Москва, заказ {number}',
+                status=status,
+                payment_method=payment_method,
+            )
+            for number, (status, payment_method) in enumerate([
+                ('Unprocessed', 'Cash'),
+                ('Unprocessed', 'Card'),
+                ('Assembling', 'Cash'),
+                ('Delivery', 'Card'),
+                ('Completed', 'Card'),
+            ])
+        ]
+        OrderCandidate.objects.create(order=cls.orders[1], restaurant=cls.restaurant)
+        Order.objects.filter(pk=cls.orders[3].pk).update(performer=cls.restaurant)
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+
+    def get_order_ids(self, response):
+        return [order.pk for order in response.context['unprocessed_orders']]
+
+    def test_queue_is_paginated_by_cursor(self):
+        url = reverse('restaurateur:view_orders')
+        seen_ids = []
+        while url:
+            response = self.client.get(url)
+            seen_ids += self.get_order_ids(response)
+            url = response.context['next_page_url']
+
+        expected_ids = [self.orders[number].pk for number in [0, 1, 3, 2]]
+        self.assertEqual(seen_ids, expected_ids)
+
+    def test_queue_is_filtered(self):
+        url = reverse('restaurateur:view_orders')
+
+        response = self.client.get(url, {'payment_method': 'Card'})
+        self.assertEqual(self.get_order_ids(response), [self.orders[1].pk, self.orders[3].pk])
+
+        response = self.client.get(url, {'restaurant': self.restaurant.pk})
+        self.assertEqual(self.get_order_ids(response), [self.orders[1].pk, self.orders[3].pk])
+
+        response = self.client.get(url, {'status': 'Assembling'})
+        self.assertEqual(self.get_order_ids(response), [self.orders[2].pk])
+
+    def test_broken_cursor_is_rejected(self):
+        response = self.client.get(reverse('restaurateur:view_orders'), {'cursor': 'broken'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_whole_queue_is_streamed(self):
+        response = self.client.get(reverse('restaurateur:view_orders'), {'stream': 'on', 'payment_method': 'Card'})
+
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('</html>', content)
+        self.assertEqual(content.count('<tr>'), 3)
+        self.assertIn(f'<td>{self.orders[1].pk}</td>', content)
+        self.assertIn('Star Burger', content)
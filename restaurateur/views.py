@@ -1,12 +1,17 @@
 import requests
 
 from django import forms
+from django.conf import settings
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import redirect, render
+from django.template.loader import get_template, render_to_string
 from django.views import View
 from django.urls import reverse_lazy
 from django.contrib.auth.decorators import user_passes_test
 from django.contrib.auth import authenticate, login
 from django.contrib.auth import views as auth_views
+from django.utils.dateparse import parse_datetime
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 
 from foodcartapp.models import Product, Restaurant, Order, RestaurantMenuItem
 
@@ -28,6 +33,54 @@ class Login(forms.Form):
     )
 
 
+def encode_cursor(order):
+    return urlsafe_base64_encode(f'{order.status}|{order.created_at.isoformat()}|{order.pk}'.encode())
+
+
+def decode_cursor(cursor):
+    try:
+        status, created_at, pk = urlsafe_base64_decode(cursor).decode().split('|')
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except ValueError:
+        raise forms.ValidationError('Некорректная ссылка на страницу')
+    if not created_at:
+        raise forms.ValidationError('Некорректная ссылка на страницу')
+    return status, created_at, pk
+
+
+class OrdersFilter(forms.Form):
+    status = forms.ChoiceField(
+        label='Статус', required=False,
+        choices=[('', 'Все')] + [choice for choice in Order.STATUSES if choice[0] != 'Completed'],
+    )
+    restaurant = forms.ModelChoiceField(
+        label='Ресторан', required=False, empty_label='Все',
+        queryset=Restaurant.objects.order_by('name'),
+    )
+    payment_method = forms.ChoiceField(
+        label='Способ оплаты', required=False,
+        choices=[('', 'Все')] + Order.PAYMENT_METHODS,
+    )
+    cursor = forms.CharField(required=False, widget=forms.HiddenInput)
+    stream = forms.BooleanField(required=False, widget=forms.HiddenInput)
+
+    def clean_cursor(self):
+        cursor = self.cleaned_data['cursor']
+        return decode_cursor(cursor) if cursor else None
+
+    def filter(self, orders):
+        if self.cleaned_data['status']:
+            orders = orders.filter(status=self.cleaned_data['status'])
+        if self.cleaned_data['restaurant']:
+            orders = orders.for_restaurant(self.cleaned_data['restaurant'])
+        if self.cleaned_data['payment_method']:
+            orders = orders.filter(payment_method=self.cleaned_data['payment_method'])
+        if self.cleaned_data['cursor'] and not self.cleaned_data['stream']:
+            orders = orders.queue_after(*self.cleaned_data['cursor'])
+        return orders
+
+
 class LoginView(View):
     def get(self, request, *args, **kwargs):
         form = Login()
@@ -92,7 +145,62 @@ def view_restaurants(request):
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_orders(request):
-    unprocessed_orders = Order.objects.exclude(status='Completed').total_price().order_by('-status').\
-        get_available_restaurants()
-    context = unprocessed_orders
-    return render(request, template_name='order_items.html', context={'unprocessed_orders': context})
+    filter_form = OrdersFilter(request.GET)
+    if not filter_form.is_valid():
+        return HttpResponseBadRequest(filter_form.errors.as_text())
+
+    page_size = settings.MANAGER_ORDERS_PAGE_SIZE
+    orders = filter_form.filter(Order.objects.queue().select_related('performer'))
+    if filter_form.cleaned_data['stream']:
+        return stream_orders(request, orders, filter_form, chunk_size=page_size)
+
+    # Restaurants and distances are loaded for the visible page only
+    unprocessed_orders = orders[:page_size + 1].with_candidates()
+
+    next_page_url = None
+    if len(unprocessed_orders) > page_size:
+        unprocessed_orders = unprocessed_orders[:page_size]
+        query = request.GET.copy()
+        query['cursor'] = encode_cursor(unprocessed_orders[-1])
+        next_page_url = f'{request.path}?{query.urlencode()}'
+
+    first_page_url = None
+    if filter_form.cleaned_data['cursor']:
+        query = request.GET.copy()
+        del query['cursor']
+        first_page_url = f'{request.path}?{query.urlencode()}'
+
+    query = request.GET.copy()
+    query.pop('cursor', None)
+    query['stream'] = 'on'
+    stream_url = f'{request.path}?{query.urlencode()}'
+
+    return render(request, template_name='order_items.html', context={
+        'unprocessed_orders': unprocessed_orders,
+        'filter_form': filter_form,
+        'next_page_url': next_page_url,
+        'first_page_url': first_page_url,
+        'stream_url': stream_url,
+    })
+
+
+ORDER_ROWS_PLACEHOLDER = 'order-rows-placeholder'
+
+
+def stream_orders(request, orders, filter_form, chunk_size):
+    """Send the whole queue without holding it in memory: rows go out chunk by chunk."""
+    page = render_to_string('order_items.html', context={
+        'filter_form': filter_form,
+        'streaming': True,
+        'order_rows_placeholder': ORDER_ROWS_PLACEHOLDER,
+    }, request=request)
+    page_start, page_end = page.split(ORDER_ROWS_PLACEHOLDER)
+    row_template = get_template('order_row.html')
+
+    def render_page():
+        yield page_start
+        for order in orders.iter_with_candidates(chunk_size):
+            yield row_template.render({'order': order}, request)
+        yield page_end
+
+    return StreamingHttpResponse(render_page(), content_type='text/html; charset=utf-8')
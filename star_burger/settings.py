@@ -12,6 +12,17 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 YANDEX_API_KEY = env('YANDEX_API_KEY')
+GEOCODER_MAX_WORKERS = env.int('GEOCODER_MAX_WORKERS', 8)
+GEOCODER_CLAIM_TIMEOUT_SECONDS = env.int('GEOCODER_CLAIM_TIMEOUT_SECONDS', 300)
+PLACE_CACHE_TTL_DAYS = env.int('PLACE_CACHE_TTL_DAYS', 30)
+PLACE_NEGATIVE_CACHE_TTL_HOURS = env.int('PLACE_NEGATIVE_CACHE_TTL_HOURS', 6)
+GEODESIC_DISTANCE_LIMIT = env.int('GEODESIC_DISTANCE_LIMIT', 100)
+RESTAURANT_SEARCH_RADIUS_KM = env.float('RESTAURANT_SEARCH_RADIUS_KM', 50)
+IDEMPOTENCY_KEY_TTL_HOURS = env.int('IDEMPOTENCY_KEY_TTL_HOURS', 24)
+ORDERS_BATCH_MAX_SIZE = env.int('ORDERS_BATCH_MAX_SIZE', 500)
+MANAGER_ORDERS_PAGE_SIZE = env.int('MANAGER_ORDERS_PAGE_SIZE', 50)
+ORDER_EVENTS_PAGE_SIZE = env.int('ORDER_EVENTS_PAGE_SIZE', 500)
+ORDER_EVENTS_SETTLE_SECONDS = env.int('ORDER_EVENTS_SETTLE_SECONDS', 5)
 SECRET_KEY = env('SECRET_KEY')
 DEBUG = env.bool('DEBUG', True)
 
@@ -79,11 +90,22 @@ TEMPLATES = [
     },
 ]
 
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'foodcartapp.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
 WSGI_APPLICATION = 'star_burger.wsgi.application'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+CACHES = {
+    'default': env.dj_cache_url('CACHE_URL', 'locmem://'),
+}
+
 DATABASES = {
     'default': dj_database_url.config(
         default='sqlite:////{0}'.format(os.path.join(BASE_DIR, 'db.sqlite3'))